@@ -0,0 +1,376 @@
+#! /usr/bin/python3
+
+"""Time the model layer on synthetic libraries, without a display or a server."""
+
+# Copyright (C) Itaï BEN YAACOV
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Usage: benchmarks/models.py [--sizes 1000,10000] [--save FILE] [--baseline FILE]
+#
+# Each benchmark is timed over a few runs (best run kept), then run once more
+# under tracemalloc for its peak memory.  With --baseline, results are compared
+# to a file written by --save and the exit status is 1 if anything got slower
+# (or bigger) than the tolerance allows.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+# The tanda database lives in the user data directory, which GLib reads once.
+DATA_DIR = tempfile.TemporaryDirectory(prefix='gampc-benchmark-')
+os.environ['XDG_DATA_HOME'] = DATA_DIR.name
+os.makedirs(os.path.join(DATA_DIR.name, 'gampc'))
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from gampc.control import editstack  # noqa: E402
+from gampc.unit import queue  # noqa: E402
+from gampc.unit import tanda  # noqa: E402
+from gampc.util import item  # noqa: E402
+from gampc.util import misc  # noqa: E402
+
+
+# As in the tanda unit.
+TANDA_FIELDS = ['Artist', 'Genre', 'Performer', 'Comment', 'Description', 'Note', 'Rhythm', 'Energy', 'Speed', 'Emotion', 'Level', 'Last_Modified', 'Last_Played']
+TANDA_SONG_FIELDS = ['Album', 'AlbumArtist', 'Artist', 'Composer', 'Date', 'Disc', 'file', 'Genre', 'Last_Modified', 'Performer', 'Track', 'Title', 'duration']
+
+SPLICES = 100
+EDITS = 50
+TANDA_UPDATES = 100
+QUEUE_CHANGES = 0.1
+
+
+def make_songs(n, seed=0):
+    rng = random.Random(seed)
+    artists = [f'Artist {i}' for i in range(max(1, n // 50))]
+    genres = ['Tango', 'Vals', 'Milonga', 'Jazz', 'Rock', 'Classical']
+    songs = []
+    for i in range(n):
+        artist = rng.choice(artists)
+        album = f'{artist} - Album {rng.randrange(5)}'
+        songs.append({
+            'file': f'{artist}/{album}/{i:06}.flac',
+            'Artist': artist,
+            'AlbumArtist': artist,
+            'Album': album,
+            'Title': f'Title {rng.randrange(n // 3 + 1)}',
+            'Genre': rng.choice(genres),
+            'Date': str(rng.randrange(1920, 2020)),
+            'Track': str(rng.randrange(1, 20)),
+            'Disc': '1',
+            'Composer': f'Composer {rng.randrange(100)}',
+            'Performer': f'Performer {rng.randrange(100)}',
+            'Last_Modified': '2020-01-01T00:00:00Z',
+            'duration': f'{rng.uniform(120, 240):.3f}',
+        })
+    return songs
+
+
+def copy_songs(songs):
+    return [dict(song) for song in songs]
+
+
+def song_store(songs):
+    store = item.ItemListStore(item_type=item.SongItem)
+    store.set_values(copy_songs(songs))
+    return store
+
+
+# Each benchmark is a function of the dataset returning a (setup, run) pair:
+# setup() prepares untimed state for one run, run(state) is timed.
+
+def bench_set_values(songs):
+    def setup():
+        return item.ItemListStore(item_type=item.SongItem), copy_songs(songs)
+
+    def run(state):
+        store, values = state
+        store.set_values(values)
+
+    return setup, run
+
+
+def bench_set_values_update(songs):
+    def setup():
+        values = copy_songs(songs)
+        for value in values:
+            value['Title'] += ' (remastered)'
+        return song_store(songs), values
+
+    def run(state):
+        store, values = state
+        store.set_values(values)
+
+    return setup, run
+
+
+def bench_splice_values(songs):
+    def setup():
+        rng = random.Random(1)
+        store = song_store(songs)
+        splices = [(rng.randrange(len(songs) - 10), copy_songs(rng.sample(songs, 10))) for i in range(SPLICES)]
+        return store, splices
+
+    def run(state):
+        store, splices = state
+        for position, values in splices:
+            store.splice_values(position, 10, values)
+
+    return setup, run
+
+
+def bench_find_duplicate_items(songs):
+    def setup():
+        return song_store(songs)
+
+    def run(store):
+        item.find_duplicate_items(store, ['Artist', 'Title'])
+
+    return setup, run
+
+
+def new_edit_stack(songs):
+    edit_stack = editstack.EditStack(copy_songs(songs), item_type=item.SongItem)
+    rng = random.Random(2)
+    for i in range(EDITS):
+        position = rng.randrange(len(songs) - 5)
+        old = [item_.value for item_ in edit_stack.item_model.items[position:position + 5]]
+        edit_stack.append_delta(editstack.DeltaSplicer(position, old, copy_songs(rng.sample(songs, 3))))
+    return edit_stack
+
+
+def bench_edit_stack_edit(songs):
+    def run(state):
+        new_edit_stack(songs)
+
+    return (lambda: None), run
+
+
+def bench_edit_stack_undo(songs):
+    def run(edit_stack):
+        for i in range(EDITS):
+            edit_stack.step(False)
+
+    return (lambda: new_edit_stack(songs)), run
+
+
+def bench_edit_stack_redo(songs):
+    def setup():
+        edit_stack = new_edit_stack(songs)
+        for i in range(EDITS):
+            edit_stack.step(False)
+        return edit_stack
+
+    def run(edit_stack):
+        for i in range(EDITS):
+            edit_stack.step(True)
+
+    return setup, run
+
+
+def bench_songs_set_fields(songs):
+    def run(values):
+        misc.songs_set_fields(values)
+
+    return (lambda: copy_songs(songs)), run
+
+
+class TandaDatabase(tanda.TandaDatabase):
+    instances = 0
+
+    def __init__(self, songs):
+        # One fresh database per dataset, filled directly rather than tanda by tanda.
+        TandaDatabase.instances += 1
+        self.songs = songs
+        super().__init__(item.ItemListStore(item_type=tanda.TandaItem), TANDA_FIELDS, TANDA_SONG_FIELDS, f'tanda-{TandaDatabase.instances}')
+
+    def setup_database(self, suffix=''):
+        super().setup_database(suffix)
+        if suffix:
+            return
+        with self.connection:
+            cursor = self.connection.cursor()
+            fields = ','.join(TANDA_SONG_FIELDS)
+            cursor.executemany(f"INSERT INTO songs({fields}) VALUES({','.join(':' + name for name in TANDA_SONG_FIELDS)})", self.songs)
+            n_tandas = len(self.songs) // 4
+            cursor.executemany('INSERT INTO tandas(tandaid,Artist,Genre) VALUES(?,?,?)', ((i, self.songs[4 * i]['Artist'], self.songs[4 * i]['Genre']) for i in range(n_tandas)))
+            cursor.executemany('INSERT INTO tanda_songs(tandaid,position,file) VALUES(?,?,?)', ((i, j, self.songs[4 * i + j]['file']) for i in range(n_tandas) for j in range(4)))
+
+
+def bench_tanda_load(songs):
+    database = TandaDatabase(songs)
+
+    def run(state):
+        database.load()
+
+    return (lambda: None), run
+
+
+def bench_tanda_update(songs):
+    database = TandaDatabase(songs)
+
+    def setup():
+        rng = random.Random(3)
+        tandas = []
+        for item_ in rng.sample(list(database.tanda_model), min(TANDA_UPDATES, len(database.tanda_model))):
+            value = dict(item_.value, tandaid=item_.tandaid, Note=str(rng.random()))
+            value['_songs'] = list(reversed(value['_songs']))
+            tandas.append(value)
+        return tandas
+
+    def run(tandas):
+        for value in tandas:
+            database.update_tanda(value)
+
+    return setup, run
+
+
+class RecordingExecutor:
+    # Stands in for an MPD executor: requests are recorded, never sent.
+    def __getattr__(self, name):
+        return lambda *args: (name,) + args
+
+
+def bench_queue_transaction(songs):
+    def setup():
+        rng = random.Random(4)
+        model = item.ItemListStore(item_type=queue.QueueSongItem)
+        model.set_values([dict(song, Id=str(i), Pos=str(i)) for i, song in enumerate(songs)])
+        manager = queue.QueueTransactionManager(model, RecordingExecutor())
+        manager._run = lambda commands: None
+        n = int(len(songs) * QUEUE_CHANGES)
+        positions = rng.sample(range(len(songs)), n)
+        # Half of the removed songs come back elsewhere (moves), the rest is new.
+        moved = [{'file': songs[p]['file']} for p in positions[:n // 2]]
+        added = [{'file': f'new/{i:06}.flac'} for i in range(n - n // 2)]
+        additions = [(rng.randrange(len(songs) + 1), [value]) for value in moved + added]
+        return manager, positions, additions
+
+    def run(state):
+        manager, positions, additions = state
+        manager.lock()
+        manager.remove_positions(positions)
+        for position, values in additions:
+            manager.add_items(position, values)
+        manager.unlock()
+
+    return setup, run
+
+
+BENCHMARKS = {
+    'ItemListStore.set_values': bench_set_values,
+    'ItemListStore.set_values (update)': bench_set_values_update,
+    'ItemListStore.splice_values': bench_splice_values,
+    'find_duplicate_items': bench_find_duplicate_items,
+    'EditStack edit': bench_edit_stack_edit,
+    'EditStack undo': bench_edit_stack_undo,
+    'EditStack redo': bench_edit_stack_redo,
+    'misc.songs_set_fields': bench_songs_set_fields,
+    'TandaDatabase.load': bench_tanda_load,
+    'TandaDatabase.update_tanda': bench_tanda_update,
+    'QueueTransactionManager.run': bench_queue_transaction,
+}
+
+
+def measure(setup, run, repeat):
+    best = None
+    for i in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+        del state
+    state = setup()
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return dict(time=best, peak=peak)
+
+
+def compare(result, baseline, tolerance, slack):
+    # Returns a note and whether it is a regression; tiny values are too noisy to judge.
+    notes = []
+    regression = False
+    for key, unit, scale, minimum in (('time', 'ms', 1000, slack), ('peak', 'KiB', 1 / 1024, 0)):
+        old, new = baseline[key], result[key]
+        if old <= 0:
+            continue
+        ratio = new / old
+        if ratio > 1 + tolerance and new - old > minimum:
+            regression = True
+            notes.append(f'{key} {ratio:.2f}x ({old * scale:.1f} {unit})')
+        elif ratio < 1 - tolerance:
+            notes.append(f'{key} {ratio:.2f}x')
+    return ', '.join(notes), regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000', help="comma-separated dataset sizes")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument('--only', help="run only benchmarks whose name contains this")
+    parser.add_argument('--save', metavar='FILE', help="write results as a baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="compare to a baseline written by --save")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument('--slack', type=float, default=0.002, help="ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    regressions = 0
+    print(f"{'benchmark':36} {'size':>7} {'ms':>10} {'peak KiB':>10}  vs baseline")
+    for size in map(int, args.sizes.split(',')):
+        songs = make_songs(size)
+        for name, benchmark in BENCHMARKS.items():
+            if args.only and args.only not in name:
+                continue
+            key = f'{name}/{size}'
+            result = results[key] = measure(*benchmark(songs), args.repeat)
+            note = ''
+            if key in baseline:
+                note, regression = compare(result, baseline[key], args.tolerance, args.slack)
+                if regression:
+                    regressions += 1
+                    note = 'REGRESSION ' + note
+            print(f"{name:36} {size:7} {result['time'] * 1000:10.1f} {result['peak'] / 1024:10.0f}  {note}", flush=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(dict(python=platform.python_version(), machine=platform.machine(), time=time.time(), results=results), f, indent=2)
+
+    if regressions:
+        print(f"{regressions} regression(s) against {args.baseline}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
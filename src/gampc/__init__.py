@@ -16,11 +16,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-import gi
-import gettext
+import sys
+
+from .util import profiler
+
+profiler.start(sys.argv)
+
+import gi  # noqa: E402
+import gettext  # noqa: E402
 
 
 gi.require_version('Gdk', '4.0')
+gi.require_version('GdkPixbuf', '2.0')
 gi.require_version('Gtk', '4.0')
 
 
@@ -32,7 +32,9 @@ from gi.repository import Gio
 from gi.repository import Gtk
 
 from .util import misc
+from .util import profiler
 from .util import unit
+from .util import watchdog
 from .util.logger import logger
 
 from . import __application__, __program_name__, __version__, __copyright__, __license_type__
@@ -47,6 +49,8 @@ class App(gasyncio.GAsyncIOApplicationMixin, Gtk.Application):
         self.add_main_option('version', ord('V'), GLib.OptionFlags.NONE, GLib.OptionArg.NONE, _("Display version"), None)
         self.add_main_option('non-unique', ord('u'), GLib.OptionFlags.NONE, GLib.OptionArg.NONE, _("Do not start a unique instance"), None)
         self.add_main_option('debug', ord('d'), GLib.OptionFlags.NONE, GLib.OptionArg.NONE, _("Debug messages"), None)
+        self.add_main_option('watchdog', 0, GLib.OptionFlags.NONE, GLib.OptionArg.INT, _("Report main loop stalls longer than MS milliseconds"), _("MS"))
+        self.add_main_option('profile-startup', 0, GLib.OptionFlags.NONE, GLib.OptionArg.FILENAME, _("Profile startup, writing a trace to FILE, or a report to standard error if FILE is '-'"), _("FILE"))
         self.add_main_option(GLib.OPTION_REMAINING, 0, GLib.OptionFlags.NONE, GLib.OptionArg.STRING_ARRAY, '', _("[ACTION...]"))
 
         self.connect('startup', self.__class__.startup_cb)
@@ -57,6 +61,8 @@ class App(gasyncio.GAsyncIOApplicationMixin, Gtk.Application):
 
         self.inhibit_cookie = 0
         self.inhibit_fd = None
+        self.watchdog_threshold = None
+        self.watchdog = None
 
     def __del__(self):
         logger.debug(f'Deleting {self}')
@@ -67,6 +73,9 @@ class App(gasyncio.GAsyncIOApplicationMixin, Gtk.Application):
         self.sigint_source = GLibUnix.signal_add(GLib.PRIORITY_DEFAULT, signal.SIGINT, lambda: self.quit() or True)
         self.excepthook_orig, sys.excepthook = sys.excepthook, self.excepthook
 
+        if self.watchdog_threshold:
+            self.watchdog = watchdog.Watchdog(self.watchdog_threshold)
+
         self.unit_manager = unit.UnitManager()
 
         default_units = [
@@ -74,11 +83,12 @@ class App(gasyncio.GAsyncIOApplicationMixin, Gtk.Application):
             'output', 'persistent',
             'css',
             'playback', 'window',
-            'current', 'queue', 'browser', 'search', 'stream', 'playlist', 'tanda',
-            'command', 'log'
+            'current', 'queue',
+            'log'
         ]
 
-        self.unit_manager.set_target(*default_units)
+        with profiler.measure('phase', 'units'):
+            self.unit_manager.set_target(*default_units)
 
         self.unit_server = self.unit_manager.get_unit('server')
         self.unit_persistent = self.unit_manager.get_unit('persistent')
@@ -91,12 +101,14 @@ class App(gasyncio.GAsyncIOApplicationMixin, Gtk.Application):
         self.notification_task = None
 
         self.unit_server.ampd_server_properties.connect('notify::state', self.set_inhibit)
-        self.unit_server.ampd_connect()
+        with profiler.measure('phase', 'connect'):
+            self.unit_server.ampd_connect()
 
         self.connect('window-removed', lambda self, window: window.cleanup())
 
     def shutdown_cb(self):
         logger.debug("Shutting down")
+        profiler.report()
 
         for window in self.get_windows():
             window.destroy()
@@ -113,6 +125,10 @@ class App(gasyncio.GAsyncIOApplicationMixin, Gtk.Application):
 
         GLib.source_remove(self.sigint_source)
 
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+
     def handle_local_options_cb(self, options):
         if options.contains('version'):
             print(_("{program} version {version}").format(program=__program_name__, version=__version__))
@@ -132,12 +148,19 @@ class App(gasyncio.GAsyncIOApplicationMixin, Gtk.Application):
         if options.contains('debug'):
             logging.getLogger().setLevel(logging.DEBUG)
 
+        if options.contains('watchdog'):
+            self.watchdog_threshold = options.lookup_value('watchdog').unpack()
+            if self.watchdog_threshold < watchdog.MIN_THRESHOLD:
+                logger.error(_("The watchdog threshold must be at least {minimum} ms").format(minimum=watchdog.MIN_THRESHOLD))
+                return 1
+
         return -1
 
     def command_line_cb(self, command_line):
         options = command_line.get_options_dict().end().unpack()
         if 'component' in options:
-            self.unit_window.new_window(options['component'])
+            with profiler.measure('phase', 'first window'):
+                self.unit_window.new_window(options['component'])
         elif GLib.OPTION_REMAINING in options:
             for option in options[GLib.OPTION_REMAINING]:
                 try:
@@ -151,14 +174,31 @@ class App(gasyncio.GAsyncIOApplicationMixin, Gtk.Application):
                     self.activate_action(name, target)
         else:
             self.activate()
+        self.report_profile_after_first_frame()
         return 0
 
+    def report_profile_after_first_frame(self):
+        if profiler.profiler is None:
+            return
+        window = self.get_active_window()
+        if window is None:
+            profiler.report()
+        elif not window.get_mapped():
+            window.connect('map', lambda window: self.report_profile_after_first_frame())
+        else:
+            def after_paint_cb(clock):
+                clock.disconnect(handler)
+                profiler.report()
+            clock = window.get_frame_clock()
+            handler = clock.connect('after-paint', after_paint_cb)
+
     def activate_cb(self):
         window = self.get_active_window()
         if window:
             window.present()
         else:
-            self.activate_action('new-window')
+            with profiler.measure('phase', 'first window'):
+                self.activate_action('new-window')
 
     @staticmethod
     def excepthook(*args):
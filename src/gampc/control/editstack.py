@@ -21,15 +21,47 @@ from gi.repository import GObject
 import weakref
 
 from ..util import action
+from ..util import config
 from ..util import item as _item
 from ..util import misc
 
 
+# Base, current state and the most recent end of history may all need to stay reachable.
+MIN_HISTORY_LIMIT = 3
+
+
+def get_history_limit_config():
+    return config.Item(int, default=EditStack.history_limit, is_valid=lambda value: value >= MIN_HISTORY_LIMIT)
+
+
+class ValueTable:
+    # Equal song values share one dict, however many deltas of a stack refer to them.
+    def __init__(self):
+        self.values = {}
+
+    def intern(self, value):
+        key = value.get('file')
+        if key is None:
+            return value
+        existing = self.values.get(key)
+        if existing is value or existing == value:
+            return existing
+        self.values[key] = value
+        return value
+
+
 class DeltaSplicer:
     def __init__(self, position, old, new):
         self.position = position
-        self.old = old
-        self.new = new
+        self.old = tuple(old)
+        self.new = tuple(new)
+
+    def intern(self, table):
+        self.old = tuple(map(table.intern, self.old))
+        self.new = tuple(map(table.intern, self.new))
+
+    def get_size(self):
+        return len(self.old) + len(self.new)
 
     def apply(self, advance, edit_stack):
         old, new = self.old, self.new
@@ -58,6 +90,14 @@ class DeltaItem:
         self.old = old
         self.new = new
 
+    @staticmethod
+    def intern(table):
+        return
+
+    @staticmethod
+    def get_size():
+        return 1
+
     def apply(self, advance, edit_stack):
         if advance:
             old, new = self.old, self.new
@@ -103,6 +143,22 @@ class Transaction:
     def reverse(self):
         return Transaction(deltas=self.deltas, advance=not self.advance)
 
+    def get_size(self):
+        return sum(delta.get_size() for delta in self.deltas)
+
+
+class Replay:
+    # Stands in for an EditStack to apply transactions to plain values.
+    def __init__(self, values, item_value):
+        self.values = values
+        self.item = _item.BaseItem(value=item_value)
+
+    def splice_values(self, p, r, a):
+        self.values[p:p + r] = a
+
+    def get_item(self):
+        return self.item
+
 
 class EditStack(_item.WithItemModelMixin, GObject.Object):
     __gsignals__ = {
@@ -110,10 +166,17 @@ class EditStack(_item.WithItemModelMixin, GObject.Object):
     }
 
     modified = GObject.Property(type=bool, default=False)
+    # Song values and item fields referred to by the history.
+    history_size = GObject.Property(type=int, default=0)
+
+    history_limit = 200
 
-    def __init__(self, values=[], item=None, **kwargs):
+    def __init__(self, values=[], item=None, *, history_limit=None, **kwargs):
         super().__init__(**kwargs)
+        if history_limit is not None:
+            self.history_limit = max(history_limit, MIN_HISTORY_LIMIT)
         self.hold_counter = 0
+        self.item_weakref = None
         self.reset()
         self.set_values(values)
         if item is not None:
@@ -124,6 +187,8 @@ class EditStack(_item.WithItemModelMixin, GObject.Object):
         self.transactions = []
         self.index = self.base = 0
         self.modified = False
+        self.history_size = 0
+        self.value_table = ValueTable()
 
     def rebase(self):
         assert self.hold_counter == 0
@@ -138,6 +203,63 @@ class EditStack(_item.WithItemModelMixin, GObject.Object):
     def get_item(self):
         return self.item_weakref()
 
+    def prune_values(self):
+        # Only keep the values that the remaining history refers to.
+        self.value_table = ValueTable()
+        for transaction in self.transactions:
+            for delta in transaction.deltas:
+                delta.intern(self.value_table)
+        self.history_size = sum(transaction.get_size() for transaction in self.transactions)
+
+    def get_state(self, index):
+        item = self.item_weakref and self.item_weakref()
+        state = Replay([item_.value for item_ in self.item_model], {} if item is None else dict(item.value))
+        for i in reversed(range(index, self.index)):
+            self.transactions[i].apply(False, state)
+        for i in range(self.index, index):
+            self.transactions[i].apply(True, state)
+        return state
+
+    @staticmethod
+    def squash(old, new):
+        deltas = []
+        old_item, new_item = old.item.value, new.item.value
+        for key in sorted(old_item.keys() | new_item.keys()):
+            if old_item.get(key) != new_item.get(key):
+                deltas.append(DeltaItem(key, old_item.get(key), new_item.get(key)))
+        old_values, new_values = old.values, new.values
+        start = 0
+        while start < min(len(old_values), len(new_values)) and old_values[start] == new_values[start]:
+            start += 1
+        end = 0
+        while end < min(len(old_values), len(new_values)) - start and old_values[-1 - end] == new_values[-1 - end]:
+            end += 1
+        if start + end < max(len(old_values), len(new_values)):
+            deltas.append(DeltaSplicer(start, old_values[start:len(old_values) - end], new_values[start:len(new_values) - end]))
+        return Transaction(deltas=deltas) if deltas else None
+
+    def compact(self):
+        # Squash the oldest transactions, split only where the base or the
+        # current state must stay reachable, so that at most three of them
+        # are left before the most recent ones, within history_limit.
+        if len(self.transactions) <= self.history_limit:
+            return
+        end = len(self.transactions) - min(self.history_limit // 2, self.history_limit - MIN_HISTORY_LIMIT)
+        bounds = sorted({0, end} | {k for k in (self.base, self.index) if 0 < k < end})
+        states = [self.get_state(k) for k in bounds]
+        positions = {0: 0}
+        squashed = []
+        for k, old, new in zip(bounds[1:], states, states[1:]):
+            transaction = self.squash(old, new)
+            if transaction is not None:
+                squashed.append(transaction)
+            positions[k] = len(squashed)
+        shift = end - len(squashed)
+        self.transactions[:end] = squashed
+        self.index = positions[self.index] if self.index < end else self.index - shift
+        self.base = positions[self.base] if self.base < end else self.base - shift
+        self.prune_values()
+
     def set_values(self, values):
         assert self.hold_counter == 0
         self.item_model.set_values(values)
@@ -146,12 +268,30 @@ class EditStack(_item.WithItemModelMixin, GObject.Object):
         assert self.hold_counter == 0
         self.item_model.splice_values(p, r, a)
 
+    def splice_difference(self, values):
+        old = self.item_model.items
+        n = min(len(old), len(values))
+        start = 0
+        while start < n and old[start].value is values[start]:
+            start += 1
+        end = 0
+        while end < n - start and old[-1 - end].value is values[-1 - end]:
+            end += 1
+        if start + end < max(len(old), len(values)):
+            self.splice_values(start, len(old) - start - end, values[start:len(values) - end])
+
     def step(self, advance):
         assert self.hold_counter == 0
         if not advance:
             assert self.index > 0
             self.index -= 1
-        focus, selection = self.transactions[self.index].apply(advance, self)
+        # Replay the transaction aside, so that the model sees a single change.
+        item = self.item_weakref and self.item_weakref()
+        state = Replay([item_.value for item_ in self.item_model], None if item is None else item.value)
+        focus, selection = self.transactions[self.index].apply(advance, state)
+        if item is not None and state.item.value is not item.value:
+            item.value = state.item.value
+        self.splice_difference(state.values)
         if advance:
             assert self.index < len(self.transactions)
             self.index += 1
@@ -169,12 +309,14 @@ class EditStack(_item.WithItemModelMixin, GObject.Object):
 
     def hold_transaction(self):
         if self.hold_counter == 0:
-            if self.base <= self.index:
-                self.transactions = self.transactions[:self.index]
-            else:
-                self.transactions = self.transactions[:self.base]
+            end = max(self.index, self.base)
+            if len(self.transactions) > end:
+                del self.transactions[end:]
+                self.prune_values()
+            if self.base > self.index:
                 for transaction in reversed(self.transactions[self.index:self.base]):
                     self.transactions.append(transaction.reverse())
+                    self.history_size += transaction.get_size()
                 self.index = len(self.transactions)
             self.transaction = Transaction()
         self.hold_counter += 1
@@ -185,11 +327,14 @@ class EditStack(_item.WithItemModelMixin, GObject.Object):
         if self.hold_counter == 0:
             if self.transaction.deltas:
                 self.transactions.append(self.transaction)
+                self.history_size += self.transaction.get_size()
                 self.step(True)
+            self.compact()
             del self.transaction
 
     def append_delta(self, delta):
         self.hold_transaction()
+        delta.intern(self.value_table)
         self.transaction.append(delta)
         self.release_transaction()
 
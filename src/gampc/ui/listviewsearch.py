@@ -16,14 +16,84 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import bisect
+
 from gi.repository import Gdk
 from gi.repository import Gtk
 
 
+class SearchIndex:
+    # Casefolded text of each row, fetched when first searched and dropped by items-changed.
+    def __init__(self, model, text_func, *args):
+        self.model = model
+        self.text_func = text_func
+        self.args = args
+        self.rows = None
+        self.matches_text = None
+        self.matches = []
+        self.store = None
+        self.model.connect('items-changed', self.items_changed_cb)
+
+    def cleanup(self):
+        self.set_store(None)
+        self.model.disconnect_by_func(self.items_changed_cb)
+
+    def set_store(self, store):
+        # The store under the (possibly filtered and sorted) model, which replaces values in place without items-changed.
+        if self.store is not None:
+            self.store.disconnect_by_func(self.values_changed_cb)
+        self.store = store
+        if store is not None:
+            store.connect('values-changed', self.values_changed_cb)
+
+    def items_changed_cb(self, model, position, removed, added):
+        self.matches_text = None
+        if self.rows is not None:
+            self.rows[position:position + removed] = [None] * added
+
+    def values_changed_cb(self, store, position, n):
+        # Store positions need not be ours, but rows whose value changed are refreshed as they are read.
+        self.matches_text = None
+
+    def get_text(self, position):
+        row = self.rows[position]
+        if row is None or row[1] is not row[0].value:
+            item = self.model[position] if row is None else row[0]
+            row = self.rows[position] = (item, item.value, self.text_func(item, *self.args).casefold())
+        return row[2]
+
+    def update_matches(self, text):
+        if self.rows is None:
+            self.rows = [None] * len(self.model)
+        if self.matches_text is not None and self.matches_text in text:
+            candidates = self.matches
+        else:
+            candidates = range(len(self.rows))
+        self.matches = [i for i in candidates if text in self.get_text(i)]
+        self.matches_text = text
+
+    def find(self, text, position, up):
+        text = text.casefold()
+        if text != self.matches_text:
+            self.update_matches(text)
+        if not self.matches:
+            return None
+        position %= len(self.rows)
+        if up:
+            j = self.matches[bisect.bisect_left(self.matches, position) % len(self.matches)]
+        else:
+            j = self.matches[bisect.bisect_right(self.matches, position) - 1]
+        if text not in self.get_text(j):
+            self.matches_text = None
+            return self.find(text, position, up)
+        return j
+
+
 class ListViewSearch(Gtk.SearchEntry):
-    def __init__(self, widget, *args):
+    def __init__(self, widget, *args, index=None):
         super().__init__()
         self.widget = widget
+        self.index = index
 
         search_action = Gtk.CallbackAction.new(self.search_action_cb)
         search_trigger = Gtk.KeyvalTrigger(keyval=Gdk.KEY_f, modifiers=Gdk.ModifierType.CONTROL_MASK)
@@ -47,6 +117,8 @@ class ListViewSearch(Gtk.SearchEntry):
         self.connect('activate', self.__class__.stop_search_cb)
 
     def cleanup(self):
+        if self.index is not None:
+            self.index.cleanup()
         self.widget.remove_controller(self.search_controller)
         del self.search_controller
         self.popover.set_child(None)
@@ -60,7 +132,7 @@ class ListViewSearch(Gtk.SearchEntry):
         self.pos = self.base
         self.up = True
 
-    def search_cb(self, widget, up, from_base, test_func, *args):
+    def search_cb(self, widget, up, from_base, *args):
         if up is None:
             up = self.up
         else:
@@ -74,20 +146,29 @@ class ListViewSearch(Gtk.SearchEntry):
             pos = self.pos - 1
 
         text = self.get_text()
-        model = widget.get_model()
+        if self.index is not None:
+            j = self.index.find(text, pos, up)
+        else:
+            j = self.search(widget.get_model(), text, pos, up, *args)
+
+        if j is None:
+            self.add_css_class('error')
+            return
+        widget.scroll_to(j, Gtk.ListScrollFlags.SELECT, None)
+        self.remove_css_class('error')
+        self.grab_focus()
+        self.pos = j
+        if not from_base:
+            self.base = j
+
+    @staticmethod
+    def search(model, text, pos, up, test_func, *args):
         n = len(model)
-
         for i in range(n):
             j = (pos + i if up else pos - i) % n
             if test_func(text, model[j], *args):
-                widget.scroll_to(j, Gtk.ListScrollFlags.SELECT, None)
-                self.remove_css_class('error')
-                self.grab_focus()
-                self.pos = j
-                if not from_base:
-                    self.base = j
-                return
-        self.add_css_class('error')
+                return j
+        return None
 
     def stop_search_cb(self):
         self.popover.popdown()
@@ -59,6 +59,13 @@ class BrowserWidget(lefttree.WidgetWithPanedTreeList):
         if a:
             self.left_selection_model[0].set_expanded(True)
 
+    def get_queue_sources(self, selection, directories=True):
+        nodes = [self.left_selection_model[position].get_item() for position in self.left_selected_positions]
+        # A directory without sub-directories is shown in full, so the server can add it directly.
+        if directories and nodes and not self.main.filtering and self.main.item_view.get_sorter().get_primary_sort_column() is None and all(node.children is None and len(node.path) > 1 for node in nodes):
+            return [('/'.join(node.path[1:]), True) for node in nodes]
+        return self.main.get_queue_sources(False)
+
 
 class BrowserTree(lefttree.Tree):
     def __init__(self, ampd):
@@ -85,9 +92,6 @@ class BrowserTree(lefttree.Tree):
 
 
 class __unit__(mixins.UnitConfigMixin, mixins.UnitComponentQueueActionMixin, unit.Unit):
-    TITLE = _("Database Browser")
-    KEY = '2'
-
     def __init__(self, manager):
         super().__init__(manager, config.Dict(paned=BrowserWidget.get_paned_config()))
 
@@ -95,14 +99,14 @@ class __unit__(mixins.UnitConfigMixin, mixins.UnitComponentQueueActionMixin, uni
         self.require('song')
         self.require('persistent')
 
-        self.tree = BrowserTree(self.ampd)
+        self.tree = BrowserTree(self.ampd_bulk)
 
     def new_widget(self):
         browser = BrowserWidget(self.unit_song.fields, self.config['paned'], self.tree)
         view = browser.main
 
         view.add_context_menu_actions(self.generate_foreign_queue_actions(view), 'foreign-queue', self.TITLE, protect=self.unit_persistent.protect, prepend=True)
-        browser.add_context_menu_actions(self.generate_foreign_queue_actions(view, False), 'foreign-queue', self.TITLE, protect=self.unit_persistent.protect, prepend=True)
+        browser.add_context_menu_actions(self.generate_foreign_queue_actions(browser, False), 'foreign-queue', self.TITLE, protect=self.unit_persistent.protect, prepend=True)
         browser.connect_clean(view.item_view, 'activate', self.view_activate_cb)
 
         return browser
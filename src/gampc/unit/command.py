@@ -28,9 +28,6 @@ from . import mixins
 
 
 class __unit__(mixins.UnitComponentMixin, mixins.UnitServerMixin, unit.Unit):
-    TITLE = _("Execute MPD commands")
-    KEY = '7'
-
     def new_widget(self):
         return compound.WidgetWithEntry(Gtk.ScrolledWindow(child=Gtk.Label(max_width_chars=50, wrap=True, selectable=True, vexpand=True)), self.entry_activate_cb)
 
@@ -24,6 +24,21 @@ from ..util import action
 from ..util import unit
 
 
+# Title and key of every component, so that they can be offered before their unit is loaded.
+COMPONENTS = {
+    'current': (_("Current Song"), '0'),
+    'queue': (_("Play Queue"), '1'),
+    'browser': (_("Database Browser"), '2'),
+    'search': (_("Search"), '3'),
+    'stream': (_("Internet Streams"), '4'),
+    'playlist': (_("Playlist"), '5'),
+    'tanda': (_("Tandas"), '6'),
+    'command': (_("Execute MPD commands"), '7'),
+    'log': (_("View log"), '8'),
+    'diagnostics': (_("Diagnostics"), '9'),
+}
+
+
 class Component:
     def __init__(self, name, title, key, factory):
         self.name = name
@@ -47,6 +62,8 @@ class __unit__(unit.Unit):
         self.menu = Gio.Menu()
         self.menu.append_section(_("Press <Ctrl> for a new instance"), self.start_menu)
         self.menu.append_section(None, self.stop_family.get_menu())
+        for name, (title, key) in COMPONENTS.items():
+            self._registered_components[name] = Component(name, title, key, None)
         self.regenerate_start()
 
     def cleanup(self):
@@ -69,12 +86,16 @@ class __unit__(unit.Unit):
         yield action.ActionInfo('component-stop', self.component_stop_cb, _("Stop component"), ['<Control><Shift>w'])
 
     def register_component(self, name, title, key, factory):
-        assert name not in self._registered_components
+        assert name not in self._registered_components or self._registered_components[name].factory is None
         self._registered_components[name] = Component(name, title, key, factory)
         self.regenerate_start()
 
     def unregister_component(self, name):
-        del self._registered_components[name]
+        # Known components stay in the menu, their unit is loaded again when needed.
+        if name in COMPONENTS:
+            self._registered_components[name].factory = None
+        else:
+            del self._registered_components[name]
         self.regenerate_start()
 
     def regenerate_start(self):
@@ -84,6 +105,8 @@ class __unit__(unit.Unit):
 
     def get_component(self, name, new_instance):
         if not self._components.setdefault(name, []) or new_instance:
+            if self._registered_components[name].factory is None:
+                self.manager.load_unit(name)
             component = self._registered_components[name].factory()
         else:
             component = self._components[name].pop(0)
@@ -103,6 +126,7 @@ class __unit__(unit.Unit):
                 self._components[name].remove(component)
                 if not self._components[name]:
                     del self._components[name]
+                    self.manager.release_unit(name)
                 return
         assert False
 
@@ -19,12 +19,20 @@
 from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gdk
+from gi.repository import GdkPixbuf
 from gi.repository import Pango
 from gi.repository import Gtk
 
+import asyncio
+import collections
+import concurrent.futures
 import os
+import time
+
+import ampd
 
 from ..util import cleanup
+from ..util import misc
 from ..util import unit
 
 from .. import __application__
@@ -32,31 +40,112 @@ from .. import __application__
 from . import mixins
 
 
-class PhotoCache(dict):
-    def __missing__(self, key):
-        photo = self.find_photo(key)
-        if photo is not None:
-            self[key] = photo
-        return photo
+class PhotoCache:
+    # Photos are decoded and downscaled in a worker thread, to heights rounded up to a power of two.
+    # Missing photos are looked for again after a while, since they may be added at any time.
+    MISSING_TTL = 300
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.textures = collections.OrderedDict()
+        self.missing = {}
+        self.loading = {}
+        self.height = 256
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='photos')
+
+    def cleanup(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_key(self, name, height):
+        if height:
+            self.height = height
+        bucket = 128
+        while bucket < self.height:
+            bucket *= 2
+        return name, bucket
+
+    def forget_missing(self):
+        self.missing.clear()
+
+    def get(self, name, height=None):
+        if name in self.missing:
+            if time.monotonic() - self.missing[name] < self.MISSING_TTL:
+                return True, None
+            del self.missing[name]
+        key = self.get_key(name, height)
+        texture = self.textures.get(key)
+        if texture is None:
+            return False, None
+        self.textures.move_to_end(key)
+        return True, texture
+
+    async def load(self, name, height=None):
+        found, texture = self.get(name, height)
+        if found:
+            return texture
+        key = self.get_key(name, height)
+        future = self.loading.get(key)
+        if future is None:
+            future = self.loading[key] = asyncio.wrap_future(self.executor.submit(self.decode, *key))
+            future.add_done_callback(lambda future: self.loaded_cb(key, future))
+        await asyncio.shield(future)
+        return self.textures.get(key)
+
+    def loaded_cb(self, key, future):
+        del self.loading[key]
+        if future.cancelled():
+            return
+        pixbuf = future.result()
+        if pixbuf is None:
+            self.missing[key[0]] = time.monotonic()
+            return
+        self.textures[key] = Gdk.Texture.new_for_pixbuf(pixbuf)
+        while len(self.textures) > self.max_size:
+            self.textures.popitem(last=False)
 
-    def find_photo(self, key):
+    @staticmethod
+    def decode(name, height):
         for extension in ('.jpg', '.png', '.gif'):
-            path = os.path.join(GLib.get_user_data_dir(), __application__, 'photos', key + extension)
+            path = os.path.join(GLib.get_user_data_dir(), __application__, 'photos', name + extension)
             if os.path.isfile(path):
-                return Gdk.Texture.new_from_filename(path)
+                try:
+                    return GdkPixbuf.Pixbuf.new_from_file_at_scale(path, -1, height, True)
+                except GLib.Error:
+                    return None
+        return None
 
 
-class Welcome(Gtk.Box):
+class ScaledBox(Gtk.Box):
     size = GObject.Property(type=int)
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.scaled_labels = []
+        self.connect('notify::size', self.__class__.notify_size_cb)
+
+    def add_scaled_label(self, label, attributes=None):
+        if attributes is not None:
+            label.set_attributes(Pango.AttrList.from_string(attributes))
+        self.scaled_labels.append((label, attributes))
+        return label
+
+    def notify_size_cb(self, pspec):
+        if self.size <= 0:
+            return
+        for label, attributes in self.scaled_labels:
+            attr_list = Pango.AttrList() if attributes is None else Pango.AttrList.from_string(attributes)
+            attr_list.insert(Pango.attr_size_new_absolute(self.size * Pango.SCALE))
+            label.set_attributes(attr_list)
+
+
+class Welcome(ScaledBox):
     def __init__(self):
         super().__init__(vexpand=True, spacing=50)
 
         self.icon = Gtk.Image(icon_name='face-cool-gampc')
         self.bind_property('size', self.icon, 'pixel-size', GObject.BindingFlags(0), lambda x, y: y * 5)
 
-        self.label = Gtk.Label(label=__application__.upper())
-        self.label.set_attributes(Pango.AttrList.from_string('0 -1 font-desc "Sans Bold", 0 -1 scale 5'))
+        self.label = self.add_scaled_label(Gtk.Label(label=__application__.upper()), '0 -1 font-desc "Sans Bold", 0 -1 scale 5')
 
         self.append(Gtk.Label(hexpand=True))
         self.append(self.icon)
@@ -72,6 +161,8 @@ class Person(Gtk.Box):
         self.condition = condition
 
         self.picture_box = None
+        self.name = None
+        self.generation = 0
         self.label = Gtk.Label(vexpand=True, ellipsize=Pango.EllipsizeMode.MIDDLE, wrap=True, lines=3)
 
         self.append(self.label)
@@ -80,22 +171,38 @@ class Person(Gtk.Box):
         if self.picture_box is not None:
             self.remove(self.picture_box)
             self.picture_box = None
+        self.name = name
+        self.generation += 1
 
         if not name or (self.condition and not self.condition(name)):
             self.set_visible(False)
             return
 
         self.label.set_label(name)
+        self.set_visible(True)
+
+        components = list(get_names(name))
+        cached = [self.photo_cache.get(component, self.get_height()) for component in components]
+        if all(found for found, photo in cached):
+            self.set_photos([photo for found, photo in cached])
+        else:
+            self.load_photos(self.generation, components)
+
+    @misc.create_task
+    async def load_photos(self, generation, components):
+        # Names can come back while an older load is pending: only the latest call may show its photos.
+        photos = [await self.photo_cache.load(component, self.get_height()) for component in components]
+        if generation == self.generation:
+            self.set_photos(photos)
 
-        for component in get_names(name):
-            photo = self.photo_cache[component]
+    def set_photos(self, photos):
+        for photo in photos:
             if photo:
                 picture = Gtk.Picture(paintable=photo)
                 if self.picture_box is None:
                     self.picture_box = Gtk.Box(halign=Gtk.Align.CENTER)
                     self.prepend(self.picture_box)
                 self.picture_box.append(picture)
-        self.set_visible(True)
 
 
 def get_names(name):
@@ -107,34 +214,31 @@ def get_names(name):
     yield name
 
 
-class Info(Gtk.Box):
-    size = GObject.Property(type=int)
-
-    def __init__(self):
+class Info(ScaledBox):
+    def __init__(self, photos):
         super().__init__(hexpand=True, orientation=Gtk.Orientation.VERTICAL, homogeneous=True)
-        self.photos = PhotoCache()
+        self.photos = photos
 
         self.artist = Person(self.photos)
-        self.artist.label.set_attributes(Pango.AttrList.from_string('0 -1 font-desc "Serif Bold", 0 -1 scale 2'))
+        self.add_scaled_label(self.artist.label, '0 -1 font-desc "Serif Bold", 0 -1 scale 2')
 
         self.performer = Person(self.photos, lambda name: name != 'Instrumental')
-        self.performer.label.set_attributes(Pango.AttrList.from_string('0 -1 font-desc "Sans", 0 -1 scale 2'))
+        self.add_scaled_label(self.performer.label, '0 -1 font-desc "Sans", 0 -1 scale 2')
 
         artist_performer_box = Gtk.Box(vexpand=True, homogeneous=True, spacing=50)
         artist_performer_box.append(self.artist)
         artist_performer_box.append(self.performer)
 
-        self.title_label = Gtk.Label(vexpand=True, wrap=True)
-        self.title_label.set_attributes(Pango.AttrList.from_string('0 -1 font-desc "Sans Bold Italic", 0 -1 scale 3'))
+        self.title_label = self.add_scaled_label(Gtk.Label(vexpand=True, wrap=True), '0 -1 font-desc "Sans Bold Italic", 0 -1 scale 3')
 
-        self.genre_label = Gtk.Label()
-        self.date_label = Gtk.Label()
-        self.composer_label = Gtk.Label()
+        self.genre_label = self.add_scaled_label(Gtk.Label())
+        self.date_label = self.add_scaled_label(Gtk.Label())
+        self.composer_label = self.add_scaled_label(Gtk.Label())
         data_box = Gtk.Box(vexpand=True, halign=Gtk.Align.CENTER, spacing=14)
         data_box.append(self.genre_label)
-        data_box.append(Gtk.Label(label="/"))
+        data_box.append(self.add_scaled_label(Gtk.Label(label="/")))
         data_box.append(self.date_label)
-        data_box.append(Gtk.Label(label="/"))
+        data_box.append(self.add_scaled_label(Gtk.Label(label="/")))
         data_box.append(self.composer_label)
 
         info_box = Gtk.Box(vexpand=True, orientation=Gtk.Orientation.VERTICAL)
@@ -153,16 +257,16 @@ class MyLayout(Gtk.BinLayout):
         return Gtk.BinLayout.do_allocate(self, box, width, height, baseline)
 
 
-class CurrentWidget(cleanup.CleanupCssMixin, cleanup.CleanupSignalMixin, Gtk.Stack):
+class CurrentWidget(cleanup.CleanupSignalMixin, Gtk.Stack):
     size = GObject.Property(type=int)
     current_song = GObject.Property()
 
-    def __init__(self):
+    def __init__(self, photos):
         self.layout = MyLayout()
         super().__init__(margin_bottom=20, margin_start=20, margin_end=20, margin_top=20, layout_manager=self.layout, css_name='current')
 
         self.welcome = Welcome()
-        self.info = Info()
+        self.info = Info(photos)
 
         self.add_child(self.welcome)
         self.add_child(self.info)
@@ -178,15 +282,16 @@ class CurrentWidget(cleanup.CleanupCssMixin, cleanup.CleanupSignalMixin, Gtk.Sta
         self.connect('notify::current-song', self.__class__.notify_current_song_cb)
 
         self.bind_property('size', self.welcome, 'size')
+        self.bind_property('size', self.info, 'size')
 
     def set_size(self):
         scale = 100.0
         song = self.current_song
         if song:
             scale += 3 * max(len(song.get('Artist', '')) - 20, len(song.get('Title', '')) - 20, 0)
-        self.size = self.layout.size / scale
-        CSS = f'current label {{ font-size: {self.size}px; }}'
-        self.css_provider.load_from_string(CSS)
+        size = int(self.layout.size / scale)
+        if size != self.size:
+            self.size = size
 
     def notify_size_cb(self, layout, pspec):
         self.set_size()
@@ -204,17 +309,22 @@ class CurrentWidget(cleanup.CleanupCssMixin, cleanup.CleanupSignalMixin, Gtk.Sta
 
 
 class __unit__(mixins.UnitComponentMixin, mixins.UnitServerMixin, unit.Unit):
-    TITLE = _("Current Song")
-    KEY = '0'
-
     current_song = GObject.Property()
 
     def __init__(self, manager):
+        self.photo_cache = PhotoCache()
         super().__init__(manager)
         self.unit_server.ampd_server_properties.connect('notify::current-song', self.notify_current_song_cb)
 
+    def cleanup(self):
+        super().cleanup()
+        self.photo_cache.cleanup()
+
+    def client_connected_cb(self, client):
+        self.photo_cache.forget_missing()
+
     def new_widget(self):
-        current = CurrentWidget()
+        current = CurrentWidget(self.photo_cache)
         self.bind_property('current-song', current, 'current-song', GObject.BindingFlags.SYNC_CREATE)
         return current
 
@@ -230,3 +340,15 @@ class __unit__(mixins.UnitComponentMixin, mixins.UnitServerMixin, unit.Unit):
                     if PERFORMER_SEP in song['Artist'] and 'Performer' not in song:
                         song['Artist'], song['Performer'] = song['Artist'].split(PERFORMER_SEP, 1)
         self.current_song = song
+        # The status is updated before the current song.
+        nextsongid = properties.status.get('nextsongid')
+        if nextsongid is not None:
+            self.prefetch_next_photos(nextsongid)
+
+    @ampd.task
+    async def prefetch_next_photos(self, nextsongid):
+        for song in await self.ampd_bulk.playlistid(nextsongid):
+            for name in (song.get('Artist'), song.get('Performer')):
+                for component in get_names(name or ''):
+                    if component:
+                        await self.photo_cache.load(component)
@@ -0,0 +1,110 @@
+"""Graphical Asynchronous Music Player Client."""
+
+# Copyright (C) Itaï BEN YAACOV
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from gi.repository import GLib
+from gi.repository import Gio
+from gi.repository import Gtk
+
+import json
+import time
+
+from ..util import cleanup
+from ..util import unit
+from ..util.logger import logger
+
+from .. import __version__
+
+from . import mixins
+
+
+def format_ms(value):
+    return '-' if value is None else f'{value:.1f}'
+
+
+class DiagnosticsWidget(cleanup.CleanupSignalMixin, Gtk.Box):
+    def __init__(self, telemetry):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
+        self.telemetry = telemetry
+        self.timeout = None
+
+        buttons = Gtk.Box(spacing=4)
+        reset_button = Gtk.Button(label=_("Reset"))
+        export_button = Gtk.Button(label=_("Export JSON..."))
+        buttons.append(reset_button)
+        buttons.append(export_button)
+        self.append(buttons)
+
+        self.buffer = Gtk.TextBuffer()
+        self.append(Gtk.ScrolledWindow(child=Gtk.TextView(buffer=self.buffer, editable=False, cursor_visible=False, monospace=True), vexpand=True, hexpand=True))
+
+        self.connect_clean(reset_button, 'clicked', self.reset_clicked_cb)
+        self.connect_clean(export_button, 'clicked', self.export_clicked_cb)
+        self.connect('map', self.__class__.map_cb)
+        self.connect('unmap', self.__class__.unmap_cb)
+
+    def cleanup(self):
+        self.unmap_cb()
+        super().cleanup()
+
+    def map_cb(self):
+        self.refresh()
+        self.timeout = GLib.timeout_add_seconds(1, self.refresh)
+
+    def unmap_cb(self):
+        if self.timeout is not None:
+            GLib.source_remove(self.timeout)
+            self.timeout = None
+
+    def refresh(self):
+        lines = [self.telemetry.summary(), '']
+        lines.append(f"{'unit':12} {'command':18} {'count':>7} {'errors':>6} {'items':>8} {'total ms':>10} {'p50':>7} {'p90':>7} {'p99':>7} {'in flight':>9}")
+        rows = [(unit_name, command, stats) for unit_name, unit_stats in self.telemetry.units.items() for command, stats in unit_stats.commands.items()]
+        for unit_name, command, stats in sorted(rows, key=lambda row: row[2].total_time, reverse=True):
+            lines.append(f"{unit_name:12} {command:18} {stats.count:7} {stats.errors:6} {stats.reply_size:8} {stats.total_time:10.0f} "
+                         f"{format_ms(stats.latency.percentile(50)):>7} {format_ms(stats.latency.percentile(90)):>7} {format_ms(stats.latency.percentile(99)):>7} "
+                         f"{stats.in_flight:4}/{stats.max_in_flight:<4}")
+        self.buffer.set_text('\n'.join(lines))
+        return True
+
+    def reset_clicked_cb(self, button):
+        self.telemetry.reset()
+        self.refresh()
+
+    def export_clicked_cb(self, button):
+        dialog = Gtk.FileDialog(initial_name=time.strftime('gampc-diagnostics-%Y%m%d-%H%M%S.json'))
+        dialog.save(self.get_root(), None, self.export_finish_cb)
+
+    def export_finish_cb(self, dialog, result):
+        try:
+            file = dialog.save_finish(result)
+        except GLib.Error:
+            return
+        report = dict(version=__version__, time=time.time(), telemetry=self.telemetry.dump())
+        try:
+            file.replace_contents(json.dumps(report, indent=2).encode(), None, False, Gio.FileCreateFlags.REPLACE_DESTINATION, None)
+        except GLib.Error as e:
+            logger.error(e.message)
+
+
+class __unit__(mixins.UnitComponentMixin, unit.Unit):
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.require('server')
+
+    def new_widget(self):
+        return DiagnosticsWidget(self.unit_server.telemetry)
@@ -19,53 +19,90 @@
 from gi.repository import GObject
 from gi.repository import Gtk
 
+import collections
 import logging
 
 from ..util import cleanup
+from ..util import config
 from ..util import unit
 
 from . import mixins
 
 
+LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+
+
 class Handler(logging.Handler, GObject.Object):
-    log = GObject.Property()
+    __gsignals__ = {
+        'record-added': (GObject.SIGNAL_RUN_FIRST, None, (int, str)),
+    }
 
-    def __init__(self):
+    def __init__(self, size):
         logging.Handler.__init__(self)
         GObject.Object.__init__(self)
-        self.flush()
+        self.records = collections.deque(maxlen=size)
 
     def emit(self, record):
-        self.log.append(record)
-        self.notify('log')
+        text = self.format(record)
+        self.records.append((record.levelno, text))
+        GObject.Object.emit(self, 'record-added', record.levelno, text)
 
     def flush(self):
-        self.log = []
-
-
-class LogWidget(cleanup.CleanupSignalMixin, Gtk.ScrolledWindow):
-    def __init__(self, handler):
-        self.label = Gtk.Label(selectable=True, vexpand=True, halign=Gtk.Align.START, valign=Gtk.Align.END, hexpand=True)
-        super().__init__(child=self.label)
-
-        self.connect_clean(handler, 'notify::log', self.handler_notify_log_cb)
-        self.connect_clean(self.get_vadjustment(), 'changed', self.adjustment_changed_cb)
-        self.handler_notify_log_cb(handler, None)
-
-    def handler_notify_log_cb(self, handler, param):
-        self.label.set_text('\n'.join(handler.format(record) for record in handler.log))
-
-    def adjustment_changed_cb(self, adjustment):
+        self.records.clear()
+
+
+class LogWidget(cleanup.CleanupSignalMixin, Gtk.Box):
+    def __init__(self, handler, config):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
+        self.handler = handler
+        self.config = config
+
+        self.level_dropdown = Gtk.DropDown.new_from_strings(LEVELS)
+        self.level_dropdown.set_halign(Gtk.Align.START)
+        self.level_dropdown.set_selected(LEVELS.index(config['level']))
+        self.append(self.level_dropdown)
+
+        self.buffer = Gtk.TextBuffer()
+        self.text_view = Gtk.TextView(buffer=self.buffer, editable=False, cursor_visible=False, monospace=True, vexpand=True, hexpand=True)
+        self.scrolled_window = Gtk.ScrolledWindow(child=self.text_view)
+        self.append(self.scrolled_window)
+
+        self.connect_clean(handler, 'record-added', self.handler_record_added_cb)
+        self.connect_clean(self.level_dropdown, 'notify::selected', self.level_notify_selected_cb)
+        self.connect_clean(self.scrolled_window.get_vadjustment(), 'changed', self.adjustment_changed_cb)
+        self.level_notify_selected_cb(self.level_dropdown, None)
+
+    def level_notify_selected_cb(self, dropdown, param):
+        self.config['level'] = LEVELS[dropdown.get_selected()]
+        self.levelno = logging.getLevelName(self.config['level'])
+        # Number of lines shown for each record the handler keeps, so that evicted records leave the view whole.
+        self.record_lines = collections.deque(self.count_lines(levelno, text) for levelno, text in self.handler.records)
+        self.buffer.set_text(''.join(text + '\n' for levelno, text in self.handler.records if levelno >= self.levelno))
+
+    def count_lines(self, levelno, text):
+        return text.count('\n') + 1 if levelno >= self.levelno else 0
+
+    def handler_record_added_cb(self, handler, levelno, text):
+        if len(self.record_lines) == handler.records.maxlen:
+            lines = self.record_lines.popleft()
+            if lines:
+                self.buffer.delete(self.buffer.get_start_iter(), self.buffer.get_iter_at_line(lines)[1])
+        self.record_lines.append(self.count_lines(levelno, text))
+        if levelno >= self.levelno:
+            self.buffer.insert(self.buffer.get_end_iter(), text + '\n')
+
+    @staticmethod
+    def adjustment_changed_cb(adjustment):
         adjustment.set_value(adjustment.get_upper())
 
 
-class __unit__(mixins.UnitComponentMixin, unit.Unit):
-    TITLE = _("View log")
-    KEY = '8'
-
+class __unit__(mixins.UnitConfigMixin, mixins.UnitComponentMixin, unit.Unit):
     def __init__(self, manager):
-        super().__init__(manager)
-        self.handler = Handler()
+        super().__init__(manager, config.Dict(
+            size=config.Item(int, default=1000, is_valid=lambda value: value > 0),
+            level=config.Item(str, default='DEBUG', is_valid=lambda value: value in LEVELS),
+        ))
+        self.handler = Handler(self.config['size'])
         self.handler.setFormatter(logging.Formatter(fmt='%(asctime)s %(levelname)s: %(name)s: %(message)s (%(pathname)s %(lineno)d)'))
         logging.getLogger().addHandler(self.handler)
 
@@ -74,4 +111,4 @@ class __unit__(mixins.UnitComponentMixin, unit.Unit):
         super().cleanup()
 
     def new_widget(self):
-        return LogWidget(self.handler)
+        return LogWidget(self.handler, self.config)
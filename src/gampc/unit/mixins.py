@@ -16,6 +16,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import asyncio
+
 from gi.repository import GObject
 from gi.repository import Gtk
 
@@ -25,6 +27,12 @@ from ..util import action
 from ..util import cleanup
 from ..util import config
 from ..util import misc
+from ..util import telemetry
+
+from . import component
+
+
+QUEUE_ADD_CHUNK_SIZE = 500
 
 
 class UnitConfigMixin:
@@ -42,13 +50,18 @@ class UnitServerMixin(cleanup.CleanupBaseMixin):
         super().__init__(manager)
 
         self.require('server')
-        self.ampd = self.unit_server.ampd_client.executor.sub_executor()
+        stats = self.unit_server.telemetry.units[self.name]
+        self.ampd = telemetry.InstrumentedExecutor(self.unit_server.ampd_client.executor.sub_executor(), stats)
+        self.ampd_interactive = telemetry.InstrumentedExecutor(self.unit_server.lane_executor('interactive'), stats)
+        self.ampd_bulk = telemetry.InstrumentedExecutor(self.unit_server.lane_executor('bulk'), stats)
         self.connect_clean(self.unit_server.ampd_client, 'client-connected', self.client_connected_cb)
         if self.ampd.get_is_connected():
             self.client_connected_cb(self.unit_server.ampd_client)
 
     def cleanup(self):
         self.ampd.close()
+        self.ampd_interactive.close()
+        self.ampd_bulk.close()
         super().cleanup()
 
     @staticmethod
@@ -88,6 +101,7 @@ class ComponentWidget(cleanup.CleanupSignalMixin, Gtk.Box):
 class UnitComponentMixin:
     def __init__(self, manager):
         super().__init__(manager)
+        self.TITLE, self.KEY = component.COMPONENTS[self.name]
         self.require('component').register_component(self.name, self.TITLE, self.KEY, self.factory)
 
     def cleanup(self):
@@ -101,53 +115,100 @@ class UnitComponentMixin:
 class UnitComponentTotalsMixin(UnitComponentMixin):
     def factory(self):
         component = super().factory()
-        store = component.widget.totals_store
-        component.widget.connect_clean(store, 'items-changed', self.totals_items_changed_cb, component, self.TITLE)
-        self.totals_items_changed_cb(store, 0, 0, 0, component, self.TITLE)
+        view = component.widget
+        view.connect_clean(view.totals, 'notify', self.totals_notify_cb, component, view)
+        view.connect_clean(view.item_selection_model, 'selection-changed', self.totals_selection_changed_cb, component, view)
+        self.set_totals_subtitle(component, view)
         return component
 
-    @staticmethod
-    def totals_items_changed_cb(store, p, r, a, component, title):
-        time = sum(float(item.get_field('duration', '0')) for item in store)
-        component.subtitle = f'{title} [{store.get_n_items()} / {misc.format_time(time)}]'
+    def totals_notify_cb(self, totals, pspec, component, view):
+        self.set_totals_subtitle(component, view)
+
+    def totals_selection_changed_cb(self, selection, position, n_items, component, view):
+        self.set_totals_subtitle(component, view)
+
+    def set_totals_subtitle(self, component, view):
+        subtitle = f'{self.TITLE} [{view.totals.n_items} / {misc.format_time(view.totals.duration)}]'
+        selected = view.get_selected_items()
+        if len(selected) > 1:
+            subtitle += ' ' + _("[selected: {n} / {time}]").format(n=len(selected), time=misc.format_time(sum(item_.duration for item_ in selected)))
+        component.subtitle = subtitle
 
 
 class UnitComponentQueueActionMixin(UnitComponentMixin, UnitServerMixin):
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.require('queue')
+        self.queue_add_tasks = {}
+
+    def cleanup(self):
+        for task in self.queue_add_tasks.values():
+            task.cancel()
+        super().cleanup()
+
     @ampd.task
     async def view_activate_cb(self, item_view, position):
         if self.unit_persistent.protect_active:
             return
         filename = item_view.get_model()[position].get_key()
-        items = await self.ampd.playlistfind('file', filename)
-        if items:
-            item_id = sorted(items, key=lambda item: item['Pos'])[0]['Id']
-        else:
-            item_id = await self.ampd.addid(filename)
-        await self.ampd.playid(item_id)
+        item_id = self.unit_queue.queue_index.find_Id(filename)
+        if item_id is None:
+            item_id = await self.ampd_interactive.addid(filename)
+        await self.ampd_interactive.playid(item_id)
 
     def generate_foreign_queue_actions(self, view, selection=True):
         yield action.ActionInfo('queue-add', self.action_queue_add_cb, _("Add to play queue"), arg=selection, arg_format='b', activate_args=(view,))
         yield action.ActionInfo('queue-replace', self.action_queue_add_cb, _("Replace play queue"), arg=selection, arg_format='b', dangerous=True, activate_args=(view,))
         yield action.ActionInfo('queue-add-high-priority', self.action_queue_add_cb, _("Add to play queue with high priority"), arg=selection, arg_format='b', activate_args=(view,))
+        yield action.ActionInfo('queue-add-cancel', self.action_queue_add_cancel_cb, _("Stop adding to play queue"), activate_args=(view,))
 
     @ampd.task
     async def action_queue_add_cb(self, action, parameter, view):
-        filenames = view.get_filenames(parameter.unpack())
         replace = '-replace' in action.get_name()
-        if replace:
-            await self.ampd.clear()
-        Ids = await self.ampd.command_list(self.ampd.addid(filename) for filename in filenames)
-        if replace:
-            await self.ampd.play()
-        if '-high-priority' in action.get_name():
-            await self.ampd.prioid(255, *Ids)
+        high_priority = '-high-priority' in action.get_name()
+        # Directories are added server-side, but then there are no Ids to prioritize.
+        sources = view.get_queue_sources(parameter.unpack(), not high_priority)
+
+        self.action_queue_add_cancel_cb(None, None, view)
+        component = view.get_ancestor(ComponentWidget)
+        key = component or view
+        task = self.queue_add_tasks[key] = asyncio.current_task()
+        subtitle = component and component.subtitle
+        try:
+            if replace:
+                await self.ampd_bulk.clear()
+            for i in range(0, len(sources), QUEUE_ADD_CHUNK_SIZE):
+                if component is not None and len(sources) > QUEUE_ADD_CHUNK_SIZE:
+                    component.subtitle = _("{subtitle} [adding {done} / {total}]").format(subtitle=subtitle, done=i, total=len(sources))
+                chunk = sources[i:i + QUEUE_ADD_CHUNK_SIZE]
+                Ids = await self.ampd_bulk.command_list(self.ampd.add(uri) if directory else self.ampd.addid(uri) for uri, directory in chunk)
+                if high_priority:
+                    await self.ampd_bulk.prioid(255, *Ids)
+                if replace and i == 0:
+                    await self.ampd_bulk.play()
+        finally:
+            if component is not None:
+                component.subtitle = subtitle
+            if self.queue_add_tasks.get(key) is task:
+                del self.queue_add_tasks[key]
+
+    def action_queue_add_cancel_cb(self, action, parameter, view):
+        task = self.queue_add_tasks.pop(view.get_ancestor(ComponentWidget) or view, None)
+        if task is not None:
+            task.cancel()
 
 
 class UnitComponentPlaylistActionMixin(UnitComponentMixin):
     def generate_foreign_playlist_actions(self, widget, selection=True):
-        yield action.ActionInfo('playlist-saveas', self.manager.get_unit('playlist').action_playlist_saveas_cb, _("Save as playlist"), arg=selection, arg_format='b', activate_args=(widget,))
+        yield action.ActionInfo('playlist-saveas', self.action_foreign_playlist_saveas_cb, _("Save as playlist"), arg=selection, arg_format='b', activate_args=(widget,))
+
+    def action_foreign_playlist_saveas_cb(self, action, parameter, widget):
+        self.manager.load_unit('playlist').action_playlist_saveas_cb(action, parameter, widget)
 
 
 class UnitComponentTandaActionMixin(UnitComponentMixin):
     def generate_foreign_tanda_actions(self, widget):
-        yield action.ActionInfo('tanda-define', self.manager.get_unit('tanda').action_tanda_define_cb, _("Define tanda"), activate_args=(widget,))
+        yield action.ActionInfo('tanda-define', self.action_foreign_tanda_define_cb, _("Define tanda"), activate_args=(widget,))
+
+    def action_foreign_tanda_define_cb(self, action, parameter, widget):
+        self.manager.load_unit('tanda').action_tanda_define_cb(action, parameter, widget)
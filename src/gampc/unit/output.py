@@ -79,9 +79,9 @@ class __unit__(mixins.UnitServerMixin, unit.Unit):
     async def action_output_activate_cb(self, action, parameter):
         output_id = action.get_name().split('-', 1)[1]
         if misc.get_modifier_state() & Gdk.ModifierType.CONTROL_MASK:
-            await self.ampd.toggleoutput(output_id)
+            await self.ampd_interactive.toggleoutput(output_id)
         elif all(map(lambda output: output['outputid'] == output_id or output['outputenabled'] == '0', await self.ampd.outputs())) and self.unit_server.ampd_server_properties.state == 'play':
-            await self.ampd.command_list([self.ampd.pause(1), self.ampd.disableoutput(output_id), self.ampd.enableoutput(output_id), self.ampd.pause(0)])
+            await self.ampd_interactive.command_list([self.ampd.pause(1), self.ampd.disableoutput(output_id), self.ampd.enableoutput(output_id), self.ampd.pause(0)])
         else:
-            await self.ampd.enableoutput(output_id)
-            await self.ampd.command_list(self.ampd.disableoutput(output['outputid']) for output in self.outputs if output['outputid'] != output_id)
+            await self.ampd_interactive.enableoutput(output_id)
+            await self.ampd_interactive.command_list(self.ampd.disableoutput(output['outputid']) for output in self.outputs if output['outputid'] != output_id)
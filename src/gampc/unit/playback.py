@@ -72,7 +72,7 @@ class __unit__(mixins.UnitServerMixin, unit.Unit):
     async def mpd_command_cb(self, caller, *data):
         if not self.unit_server.ampd_server_properties.state:
             await self.ampd.idle(ampd.IDLE)
-        await getattr(self.ampd, caller.get_name())()
+        await getattr(self.ampd_interactive, caller.get_name())()
 
     @hold_app
     @ampd.task
@@ -80,7 +80,7 @@ class __unit__(mixins.UnitServerMixin, unit.Unit):
         if not self.unit_server.ampd_server_properties.state:
             await self.ampd.idle(ampd.IDLE)
             await self.ampd.idle(ampd.IDLE)
-        await (self.ampd.pause(1) if self.unit_server.ampd_server_properties.state == 'play' else self.ampd.play())
+        await (self.ampd_interactive.pause(1) if self.unit_server.ampd_server_properties.state == 'play' else self.ampd_interactive.play())
 
     @hold_app
     @ampd.task
@@ -17,6 +17,10 @@
 
 
 import asyncio
+import bisect
+import collections
+import difflib
+import json
 
 from gi.repository import Gio
 from gi.repository import Gtk
@@ -26,6 +30,7 @@ import ampd
 from ..util import action
 from ..util import cleanup
 from ..util import config
+from ..util import db
 from ..util import item
 from ..util import misc
 from ..util import unit
@@ -44,11 +49,12 @@ PSEUDO_SEPARATOR = ' % '
 
 
 class PlaylistWidget(editstack.WidgetEditStackMixin, lefttree.WidgetWithPanedTreeList):
-    def __init__(self, fields, separator, config, root_model, listplaylistinfo):
+    def __init__(self, fields, separator, config, root_model, listplaylistinfo, cache):
         main = ViewWithCopyPasteSong(fields=fields, separator=separator)
         super().__init__(main, config, root_model, edit_stack_view=main)
         self.add_cleanup_below(main)
         self.listplaylistinfo = listplaylistinfo
+        self.cache = cache
 
         self.main.context_menu.append_section(None, self.edit_stack_menu)
         self.context_menu.append_section(None, self.edit_stack_menu)
@@ -63,14 +69,14 @@ class PlaylistWidget(editstack.WidgetEditStackMixin, lefttree.WidgetWithPanedTre
         if self.left_selected_item and isinstance(self.left_selected_item, PlaylistNode):
             self.main.set_editable(True)
             self.set_edit_stack(self.left_selected_item.edit_stack)
-            self.left_selected_item.playlist.update(self.listplaylistinfo)
+            self.left_selected_item.playlist.update(self.listplaylistinfo, self.cache)
         else:
             self.main.set_editable(False)
             self.set_edit_stack(None)
             for pos in self.left_selected_positions:
                 node = selection[pos].get_item()
                 if isinstance(node, PlaylistNode):
-                    node.playlist.update(self.listplaylistinfo)
+                    node.playlist.update(self.listplaylistinfo, self.cache)
 
     @staticmethod
     def left_view_activate_cb(left_view, position):
@@ -83,20 +89,18 @@ class PlaylistWidget(editstack.WidgetEditStackMixin, lefttree.WidgetWithPanedTre
 
 
 class ChoosePathDialog(dialog.TextDialog):
-    def __init__(self, *args, paths, init=None, path_ok=False, **kwargs):
-        self.paths = list(paths)
+    def __init__(self, *args, trie, init=None, path_ok=False, **kwargs):
+        self.trie = trie
         self.path_ok = path_ok
 
+        self.completion_model = Gtk.ListStore(str)
+        self.completion_folder = None
+
         super().__init__(*args, text=init, **kwargs)
 
         self.entry.connect('activate', self.entry_activate_cb)
 
-        model = Gtk.ListStore(str)
-        for p in self.paths:
-            i = model.append()
-            model.set_value(i, 0, p)
-
-        completion = Gtk.EntryCompletion(model=model, text_column=0, inline_completion=True, inline_selection=True)
+        completion = Gtk.EntryCompletion(model=self.completion_model, text_column=0, inline_completion=True, inline_selection=True)
         completion.set_match_func(self.match_func)
         self.entry.set_completion(completion)
 
@@ -104,6 +108,20 @@ class ChoosePathDialog(dialog.TextDialog):
         completion.get_area().add(cell)
         completion.get_area().attribute_connect(cell, 'text', 0)
 
+    def entry_notify_text_cb(self, *args):
+        self.update_completion(self.entry.get_text())
+        super().entry_notify_text_cb(*args)
+
+    def update_completion(self, text):
+        folder = text.rsplit('/', 1)[0].lower() if '/' in text else ''
+        if folder == self.completion_folder:
+            return
+        self.completion_folder = folder
+        self.completion_model.clear()
+        for p in self.trie.get_paths(folder.split('/') if folder else []):
+            i = self.completion_model.append()
+            self.completion_model.set_value(i, 0, p)
+
     @staticmethod
     def match_func(completion, key, i):
         key = completion.get_entry().get_text().lower()
@@ -118,7 +136,7 @@ class ChoosePathDialog(dialog.TextDialog):
         entry.get_completion().complete()
 
     def validate_text(self, text):
-        if not text or (text + '/') in self.paths:
+        if not text or self.trie.is_folder(text.split('/')):
             return False
         if not self.path_ok and text.endswith('/'):
             return False
@@ -144,16 +162,120 @@ class PlaylistNode(lefttree.Node):
     def __init__(self, *args, playlist):
         self.playlist = playlist
         if playlist.edit_stack is None:
-            playlist.edit_stack = editstack.EditStack(item_type=item.SongItem)
+            playlist.edit_stack = editstack.EditStack(item_type=item.SongItem, history_limit=playlist.history_limit)
         self.edit_stack = playlist.edit_stack
 
         super().__init__(*args, icon='view-list-symbolic', item_model=self.edit_stack.item_model)
 
 
+class PlaylistTrieNode:
+    def __init__(self):
+        self.children = {}
+        self.folders = []
+        self.playlists = []
+        self.count = 0
+        self.is_playlist = False
+
+
+class PlaylistTrie:
+    # Sub-folders and playlists are kept sorted in each node, so listing a
+    # folder costs time proportional to its contents.
+    def __init__(self):
+        self.root = PlaylistTrieNode()
+
+    def add(self, name):
+        path = name.split(PSEUDO_SEPARATOR)
+        leaf = self.get_node(path)
+        if leaf is not None and leaf.is_playlist:
+            return
+        node = self.root
+        for element in path[:-1]:
+            node.count += 1
+            child = node.children.get(element)
+            if child is None:
+                child = node.children[element] = PlaylistTrieNode()
+            if child.count == 0:
+                bisect.insort(node.folders, element)
+            node = child
+        node.count += 1
+        if leaf is None:
+            leaf = node.children[path[-1]] = PlaylistTrieNode()
+        leaf.is_playlist = True
+        bisect.insort(node.playlists, path[-1])
+
+    def remove(self, name):
+        path = name.split(PSEUDO_SEPARATOR)
+        nodes = [self.root]
+        for element in path:
+            nodes.append(nodes[-1].children[element])
+        leaf = nodes[-1]
+        assert leaf.is_playlist
+        leaf.is_playlist = False
+        self._remove_sorted(nodes[-2].playlists, path[-1])
+        for i in reversed(range(len(path))):
+            parent, child = nodes[i], nodes[i + 1]
+            if i < len(path) - 1:
+                child.count -= 1
+                if child.count == 0:
+                    self._remove_sorted(parent.folders, path[i])
+            if child.count == 0 and not child.is_playlist:
+                del parent.children[path[i]]
+        self.root.count -= 1
+
+    @staticmethod
+    def _remove_sorted(names, name):
+        del names[bisect.bisect_left(names, name)]
+
+    def get_node(self, path):
+        node = self.root
+        for element in path:
+            node = node.children.get(element)
+            if node is None:
+                return None
+        return node
+
+    def is_folder(self, path):
+        node = self.get_node(path)
+        return node is not None and node.count > 0
+
+    def get_folder_contents(self, path):
+        node = self.get_node(path)
+        if node is None:
+            return [], []
+        return list(node.folders), list(node.playlists)
+
+    def get_names(self, path):
+        node = self.get_node(path)
+        if node is not None:
+            yield from self._get_names(node, path)
+
+    def _get_names(self, node, path):
+        for name in node.playlists:
+            yield PSEUDO_SEPARATOR.join(path + [name])
+        for name in node.folders:
+            yield from self._get_names(node.children[name], path + [name])
+
+    def get_nodes_ignore_case(self, path):
+        nodes = [([], self.root)]
+        for element in path:
+            element = element.lower()
+            nodes = [(real_path + [name], node.children[name]) for real_path, node in nodes for name in node.folders if name.lower() == element]
+        return nodes
+
+    def get_paths(self, path):
+        # Completion matches case-insensitively, so list every folder whose path matches.
+        for real_path, node in self.get_nodes_ignore_case(path):
+            for name in node.folders:
+                yield '/'.join(real_path + [name]) + '/'
+            for name in node.playlists:
+                yield '/'.join(real_path + [name])
+
+
 class PlaylistTree(lefttree.Tree):
-    def __init__(self, playlists):
+    def __init__(self, playlists, trie):
         super().__init__()
         self.playlists = playlists
+        self.trie = trie
 
     @staticmethod
     def get_root():
@@ -162,7 +284,7 @@ class PlaylistTree(lefttree.Tree):
     @misc.create_task
     async def fill_node(self, node):
         if isinstance(node, FolderNode):
-            folders, playlists = self.get_pseudo_folder_contents(node.path)
+            folders, playlists = self.trie.get_folder_contents(node.path)
             expanded = node.name is None or any(row.get_expanded() for row in node.rows)
             self.merge(node.children_model[0], folders, expanded, lambda name: FolderNode(name, node.path))
             self.merge(node.children_model[1], playlists, False, lambda name: self.get_playlist_node(name, node.path))
@@ -170,58 +292,155 @@ class PlaylistTree(lefttree.Tree):
     def get_playlist_node(self, name, path):
         return PlaylistNode(name, path, playlist=self.playlists[PSEUDO_SEPARATOR.join(path + [name])])
 
-    def get_pseudo_folder_contents(self, path):
-        prefix = PSEUDO_SEPARATOR.join(path + [''])
-        folders = []
-        names = []
-
-        last_folder = None
-
-        for name in sorted(self.playlists):
-            if not name.startswith(prefix):
-                continue
-            name = name[len(prefix):]
-            if PSEUDO_SEPARATOR in name:
-                folder_name = name[:name.find(PSEUDO_SEPARATOR)]
-                if folder_name != last_folder:
-                    last_folder = folder_name
-                    folders.append(folder_name)
-            else:
-                names.append(name)
-
-        return folders, names
-
 
 class Playlist:
-    def __init__(self, name, last_modified):
+    def __init__(self, name, last_modified, history_limit):
         self.name = name
         self.last_modified = last_modified
+        self.history_limit = history_limit
         self.clean = False
         self.edit_stack = None
+        self.known_files = None
+
+    def get_known_files(self):
+        if self.known_files is not None and self.known_files[0] == self.last_modified:
+            return self.known_files[1]
 
-    def update(self, listplaylistinfo):
+    def set_songs(self, last_modified, songs):
+        self.known_files = last_modified, [song['file'] for song in songs]
+        self.edit_stack.item_model.set_values(songs)
+
+    def update(self, listplaylistinfo, cache):
         if self.clean is not True:
             if self.clean is not False:
                 self.clean.cancel()
-            self.clean = asyncio.create_task(self._update(listplaylistinfo))
+            songs = None if self.edit_stack.transactions else cache.get_songs(self.name, self.last_modified)
+            if songs is not None:
+                self.set_songs(self.last_modified, songs)
+                self.clean = True
+            else:
+                self.clean = asyncio.create_task(self._update(listplaylistinfo, cache))
 
-    async def _update(self, listplaylistinfo):
+    async def _update(self, listplaylistinfo, cache):
         try:
             if not self.edit_stack.transactions:
+                last_modified = self.last_modified
                 self.edit_stack.item_model.set_values([])
                 songs = await listplaylistinfo(self.name)
                 misc.songs_set_fields(songs)
-                self.edit_stack.item_model.set_values(songs)
+                cache.set_songs(self.name, last_modified, songs)
+                self.set_songs(last_modified, songs)
         except Exception:
             self.clean = False
             raise
         self.clean = True
 
 
-class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitComponentQueueActionMixin, mixins.UnitComponentTandaActionMixin, mixins.UnitComponentPlaylistActionMixin, unit.Unit):
-    TITLE = _("Playlist")
-    KEY = '5'
+def playlist_diff(old, new, limit=None):
+    # Entries of the longest matching blocks stay in place, other surviving
+    # entries are moved once, and the rest is deleted or added.  Returns None
+    # as soon as there would be more than limit operations.
+    old_counts, new_counts = collections.Counter(old), collections.Counter(new)
+    if limit is not None and sum((old_counts - new_counts).values()) + sum((new_counts - old_counts).values()) > limit:
+        return None
+
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    target = [None] * len(old)
+    kept = set()
+    matched = set()
+    for i, j, n in matcher.get_matching_blocks():
+        for k in range(n):
+            target[i + k] = j + k
+            kept.add(i + k)
+            matched.add(j + k)
+    unmatched = {}
+    for j, name in enumerate(new):
+        if j not in matched:
+            unmatched.setdefault(name, []).append(j)
+    for i, name in enumerate(old):
+        if target[i] is None and unmatched.get(name):
+            target[i] = unmatched[name].pop(0)
+
+    operations = [('delete', i) for i in reversed(range(len(old))) if target[i] is None]
+    adds = sorted(('add', j, name) for name, positions in unmatched.items() for j in positions)
+    movers = sorted((i for i in range(len(old)) if target[i] is not None and i not in kept), key=lambda i: target[i])
+    if limit is not None and len(operations) + len(adds) > limit:
+        return None
+
+    # Moving an entry empties its slot and fills a new one right after the
+    # slot of its predecessor.  Slots are never removed, so their order is
+    # fixed, and positions are counts of occupied slots.
+    HEAD = -1
+    following = {}
+    previous = HEAD
+    for i in range(len(old)):
+        if target[i] is not None:
+            following[previous] = previous = i
+    slot_of = {}
+    placed = sorted(target[i] for i in kept)
+    placed_by_target = {target[i]: i for i in kept}
+    steps = []
+    for n, i in enumerate(movers):
+        k = bisect.bisect_left(placed, target[i])
+        anchor = slot_of.get(placed_by_target[placed[k - 1]], placed_by_target[placed[k - 1]]) if k else HEAD
+        slot = len(old) + n
+        following[slot] = following.get(anchor)
+        following[anchor] = slot
+        steps.append((slot_of.get(i, i), anchor, slot))
+        slot_of[i] = slot
+        placed.insert(k, target[i])
+        placed_by_target[target[i]] = i
+
+    order = {}
+    slot = following.get(HEAD)
+    while slot is not None:
+        order[slot] = len(order)
+        slot = following.get(slot)
+    occupied = misc.OccupiedSlots(len(order))
+    for i in range(len(old)):
+        if target[i] is not None:
+            occupied.add(order[i], 1)
+    for old_slot, anchor, slot in steps:
+        j = occupied.count_before(order[old_slot])
+        occupied.add(order[old_slot], -1)
+        position = 0 if anchor == HEAD else occupied.count_before(order[anchor] + 1)
+        occupied.add(order[slot], 1)
+        if position != j:
+            operations.append(('move', j, position))
+            if limit is not None and len(operations) + len(adds) > limit:
+                return None
+
+    return operations + adds
+
+
+class PlaylistCache(db.Database):
+    def __init__(self, name):
+        self.server = None
+        super().__init__(name)
+
+    def setup_database(self):
+        self.connection.cursor().execute('CREATE TABLE IF NOT EXISTS playlist_cache(server TEXT NOT NULL, name TEXT NOT NULL, last_modified TEXT NOT NULL, songs TEXT NOT NULL, PRIMARY KEY(server, name))')
+
+    def get_songs(self, name, last_modified):
+        if self.server is None:
+            return None
+        t = self.connection.cursor().execute('SELECT songs FROM playlist_cache WHERE server=? AND name=? AND last_modified=?', (self.server, name, last_modified)).fetchone()
+        return None if t is None else json.loads(t[0])
+
+    def set_songs(self, name, last_modified, songs):
+        if self.server is None:
+            return
+        with self.connection:
+            self.connection.cursor().execute('INSERT OR REPLACE INTO playlist_cache(server, name, last_modified, songs) VALUES(?, ?, ?, ?)', (self.server, name, last_modified, json.dumps(songs, ensure_ascii=False)))
 
+    def forget_songs(self, name):
+        if self.server is None:
+            return
+        with self.connection:
+            self.connection.cursor().execute('DELETE FROM playlist_cache WHERE server=? AND name=?', (self.server, name))
+
+
+class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitComponentQueueActionMixin, mixins.UnitComponentTandaActionMixin, mixins.UnitComponentPlaylistActionMixin, unit.Unit):
     TEMPNAME = '$$TEMP$$'
 
     CSS = """
@@ -232,7 +451,7 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
     """
 
     def __init__(self, manager):
-        super().__init__(manager, config.Dict(paned=PlaylistWidget.get_paned_config()))
+        super().__init__(manager, config.Dict(paned=PlaylistWidget.get_paned_config(), history_limit=editstack.get_history_limit_config()))
 
         self.require('database')
         self.require('song')
@@ -241,10 +460,20 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
         self.css_provider.load_from_string(self.CSS)
 
         self.playlists = {}
-        self.tree = PlaylistTree(self.playlists)
+        self.playlist_trie = PlaylistTrie()
+        self.tree = PlaylistTree(self.playlists, self.playlist_trie)
+
+        self.db = PlaylistCache(self.name)
+
+    def cleanup(self):
+        del self.db
+        super().cleanup()
+
+    def can_release(self):
+        return not any(playlist.edit_stack is not None and playlist.edit_stack.transactions for playlist in self.playlists.values())
 
     def new_widget(self):
-        playlist = PlaylistWidget(self.unit_song.fields, self.unit_database.separator, self.config['paned'], self.tree, self.ampd.listplaylistinfo)
+        playlist = PlaylistWidget(self.unit_song.fields, self.unit_database.separator, self.config['paned'], self.tree, self.ampd_bulk.listplaylistinfo, self.db)
         view = playlist.main
 
         view.add_context_menu_actions(self.generate_foreign_queue_actions(view), 'foreign-queue', self.TITLE, protect=self.unit_persistent.protect, prepend=True)
@@ -260,6 +489,7 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
 
     @ampd.task
     async def client_connected_cb(self, client):
+        self.db.server = self.unit_server.profile.address
         while True:
             await self.update_playlists()
             await self.ampd.idle(ampd.STORED_PLAYLIST)
@@ -272,12 +502,15 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
             if last_modified is None:
                 if playlist.edit_stack is None or not playlist.edit_stack.transactions:
                     del self.playlists[name]
+                    self.playlist_trie.remove(name)
+                    self.db.forget_songs(name)
                     changed.append(name)
             elif last_modified != playlist.last_modified:
                 playlist.last_modified = last_modified
                 playlist.clean = False
         for name in playlists:
-            self.playlists[name] = Playlist(name, playlists[name])
+            self.playlists[name] = Playlist(name, playlists[name], self.config['history_limit'])
+            self.playlist_trie.add(name)
             changed.append(name)
 
         if changed:
@@ -289,21 +522,6 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
             self.tree.root.mark_changed_paths(changed_paths)
         self.tree.start()
 
-    def playlist_paths(self):
-        last_path = []
-        for playlist_name in sorted(self.playlists):
-            playlist_path = playlist_name.split(PSEUDO_SEPARATOR)
-            common = min(len(last_path), len(playlist_path) - 1)
-            for i in range(common):
-                if last_path[i] != playlist_path[i]:
-                    common = i
-                    break
-            last_path = last_path[:common]
-            for element in playlist_path[common:-1]:
-                last_path.append(element)
-                yield '/'.join(last_path) + '/'
-            yield '/'.join(playlist_path)
-
     def generate_playlist_actions(self, widget):
         yield action.ActionInfo('save', self.global_action_cb, activate_args=(widget,))
         yield action.ActionInfo('rename', self.global_action_cb, _("Rename"), activate_args=(widget,))
@@ -327,7 +545,7 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
         elif action.get_name() == 'delete':
             await self.delete_playlist(window, path)
         elif action.get_name() == 'update-from-queue':
-            await self.save_playlist(window, path, await self.ampd.playlist())
+            await self.save_playlist(window, path, await self.ampd_bulk.playlist())
 
     async def save_playlist(self, window, playlist_path, filenames):
         playlist_name = playlist_path.replace('/', PSEUDO_SEPARATOR)
@@ -335,26 +553,63 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
         if playlist_name in self.playlists and not await dialog.QuestionDialog(transient_for=window, message=_("Replace existing playlist {name}?").format(name=playlist_path)).run():
             return False
 
+        commands = await self.get_diff_commands(playlist_name, filenames)
+        if commands is not None:
+            if commands:
+                await self.ampd_bulk.command_list(commands)
+            return True
+
         try:
-            await self.ampd.rm(self.TEMPNAME)
+            await self.ampd_bulk.rm(self.TEMPNAME)
         except ampd.ReplyError:
             pass
         try:
-            await self.ampd.command_list([self.ampd.playlistadd(self.TEMPNAME, name) for name in filenames])
+            await self.ampd_bulk.command_list([self.ampd.playlistadd(self.TEMPNAME, name) for name in filenames])
             if playlist_name in self.playlists:
-                await self.ampd.rm(playlist_name)
-            await self.ampd.rename(self.TEMPNAME, playlist_name)
+                await self.ampd_bulk.rm(playlist_name)
+            await self.ampd_bulk.rename(self.TEMPNAME, playlist_name)
         except Exception:
             try:
-                await self.ampd.rm(self.TEMPNAME)
+                await self.ampd_bulk.rm(self.TEMPNAME)
             except ampd.ReplyError:
                 pass
             raise
         return True
 
+    async def get_diff_commands(self, playlist_name, filenames):
+        playlist = self.playlists.get(playlist_name)
+        old = playlist and playlist.get_known_files()
+        if old is None:
+            return None
+        add_at_position = tuple(map(int, self.ampd.get_protocol_version().split('.'))) >= (0, 23, 3)
+        commands = []
+        length = len(old)
+        # Matching large playlists takes a noticeable time, keep it off the main loop.
+        operations = await asyncio.get_event_loop().run_in_executor(None, playlist_diff, old, list(filenames), len(filenames))
+        if operations is None:
+            return None
+        for operation in operations:
+            if operation[0] == 'delete':
+                commands.append(self.ampd.playlistdelete(playlist_name, operation[1]))
+                length -= 1
+            elif operation[0] == 'move':
+                commands.append(self.ampd.playlistmove(playlist_name, operation[1], operation[2]))
+            else:
+                position, name = operation[1:]
+                if add_at_position:
+                    commands.append(self.ampd.playlistadd(playlist_name, name, position))
+                else:
+                    commands.append(self.ampd.playlistadd(playlist_name, name))
+                    if position != length:
+                        commands.append(self.ampd.playlistmove(playlist_name, length, position))
+                length += 1
+            if len(commands) > len(filenames):
+                return None
+        return commands
+
     async def rename_playlist(self, window, old_path, folder):
         title = _("Rename playlist folder") if folder else _("Rename playlist")
-        dialog_ = ChoosePathDialog(transient_for=window, title=title, paths=self.playlist_paths(), init=old_path)
+        dialog_ = ChoosePathDialog(transient_for=window, title=title, trie=self.playlist_trie, init=old_path)
         new_path = await dialog_.run()
         if new_path is None or old_path == new_path:
             return
@@ -363,10 +618,9 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
         new_real = new_path.replace('/', PSEUDO_SEPARATOR)
 
         if folder:
-            for name in self.playlists:
-                if name.startswith(old_real):
-                    suffix = name[len(old_real):]
-                    await self.ampd.rename(name, new_real + suffix)
+            for name in list(self.playlist_trie.get_names(old_path.split('/'))):
+                suffix = name[len(old_real):]
+                await self.ampd.rename(name, new_real + suffix)
         else:
             await self.ampd.rename(old_real, new_real)
 
@@ -382,7 +636,7 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
             await dialog.MessageDialog(message=_("Nothing to save!"), transient_for=view.get_root(), title="").run()
             return
 
-        playlist_path = await ChoosePathDialog(transient_for=view.get_root(), title=_("Save as playlist"), paths=self.playlist_paths()).run()
+        playlist_path = await ChoosePathDialog(transient_for=view.get_root(), title=_("Save as playlist"), trie=self.playlist_trie).run()
         if playlist_path is None:
             return
         await self.save_playlist(view.get_root(), playlist_path, filenames)
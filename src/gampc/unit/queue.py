@@ -16,6 +16,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import bisect
+
 from gi.repository import GLib
 from gi.repository import GObject
 
@@ -61,6 +63,27 @@ class QueueSongItem(item.SongItem):
             misc.add_unique_css_class(widget.get_parent(), QUEUE_PRIORITY_CSS_PREFIX, '' if self.Prio is not None else None)
 
 
+def longest_increasing_subsequence(values):
+    tails = []
+    tails_index = []
+    previous = [None] * len(values)
+    for i, value in enumerate(values):
+        k = bisect.bisect_left(tails, value)
+        if k == len(tails):
+            tails.append(value)
+            tails_index.append(i)
+        else:
+            tails[k] = value
+            tails_index[k] = i
+        previous[i] = tails_index[k - 1] if k else None
+    result = []
+    i = tails_index[-1] if tails_index else None
+    while i is not None:
+        result.append(i)
+        i = previous[i]
+    return result[::-1]
+
+
 class QueueTransactionManager:
     def __init__(self, model, ampd):
         self.model = model
@@ -69,65 +92,166 @@ class QueueTransactionManager:
 
     def add_items(self, position, items):
         self.lock()
-        if self.valid:
-            if self.add is None:
-                self.add = position, items
-            else:
-                self.valid = False
+        self.add.append((position, items))
         self.unlock()
 
     def remove_positions(self, positions):
         self.lock()
-        if self.valid:
-            for p in positions:
-                self.remove.setdefault(self.model[p].get_key(), []).append((p, self.model[p].Id))
+        self.remove.update(positions)
         self.unlock()
 
     def lock(self):
         if self.hold_count == 0:
-            self.valid = True
-            self.add = None
-            self.remove = {}
+            self.add = []
+            self.remove = set()
         self.hold_count += 1
 
     def unlock(self):
         self.hold_count -= 1
         if self.hold_count == 0:
-            if self.valid:
-                self.run()
-            del self.valid, self.add, self.remove
+            self.run()
+            del self.add, self.remove
 
     def run(self):
-        commands = []
-        if self.add is not None:
-            p, items = self.add
-            p0 = p
-            for item_ in items:
+        commands = self.plan()
+        if commands:
+            self._run(commands)
+
+    def plan(self):
+        n = len(self.model)
+        removed = {}
+        for p in sorted(self.remove):
+            removed.setdefault(self.model[p].get_key(), []).append(self.model[p].Id)
+        blocks = {}
+        for p, items in self.add:
+            blocks.setdefault(p, []).extend(items)
+
+        # Final queue contents: Id of a kept or moved song, or None and the file to add.
+        target = []
+        for p in range(n + 1):
+            for item_ in blocks.get(p, ()):
                 key = item_['file']
-                if key in self.remove:
-                    q, Id = self.remove[key].pop(0)
-                    if not self.remove[key]:
-                        del self.remove[key]
-                    if q < p0:
-                        p -= 1
-                    commands.append(self.ampd.moveid(Id, p))
-                else:
-                    commands.append(self.ampd.add(key, p))
-                p += 1
-        while self.remove:
-            key, remove = self.remove.popitem()
-            commands += [self.ampd.deleteid(Id) for p, Id in remove]
-        self._run(commands)
+                target.append((removed[key].pop(0) if removed.get(key) else None, key))
+            if p < n and p not in self.remove:
+                target.append((self.model[p].Id, None))
+
+        deleted = {Id for Ids in removed.values() for Id in Ids}
+        commands = [self.ampd.deleteid(Id) for Id in deleted]
+        current = [item_.Id for item_ in self.model if item_.Id not in deleted]
+
+        ordered = [Id for Id, key in target if Id is not None]
+        rank = {Id: r for r, Id in enumerate(ordered)}
+        position = {Id: i for i, Id in enumerate(current)}
+        staying = {ordered[r] for r in longest_increasing_subsequence([position[Id] for Id in ordered])}
+        movers = [Id for Id in ordered if Id not in staying]
+
+        # Movers are handled in rank order, each one landing right after the
+        # song of the previous rank.  Between two staying songs, the songs
+        # already moved there thus precede those still waiting to move, so
+        # every song has a fixed slot before its move and one after it.
+        gaps = [(None, [], [])]
+        for Id in ordered:
+            if Id in staying:
+                gaps.append((Id, [], []))
+            else:
+                gaps[-1][1].append(Id)
+        gap = 0
+        for Id in current:
+            if Id in staying:
+                gap += 1
+            else:
+                gaps[gap][2].append(Id)
+        slot_from = {}
+        slot_to = {}
+        slot = 0
+        for staying_Id, moved, waiting in gaps:
+            if staying_Id is not None:
+                slot_from[staying_Id] = slot_to[staying_Id] = slot
+                slot += 1
+            for Id in moved:
+                slot_to[Id] = slot
+                slot += 1
+            for Id in waiting:
+                slot_from[Id] = slot
+                slot += 1
+        occupied = misc.OccupiedSlots(slot)
+        for Id in current:
+            occupied.add(slot_from[Id], 1)
+
+        i = 0
+        while i < len(movers):
+            start = occupied.count_before(slot_from[movers[i]])
+            k = 1
+            while i + k < len(movers) and rank[movers[i + k]] == rank[movers[i]] + k and occupied.count_before(slot_from[movers[i + k]]) == start + k:
+                k += 1
+            group = movers[i:i + k]
+            for Id in group:
+                occupied.add(slot_from[Id], -1)
+            r = rank[group[0]]
+            to = occupied.count_before(slot_to[ordered[r - 1]]) + 1 if r else 0
+            for Id in group:
+                occupied.add(slot_to[Id], 1)
+            if to != start:
+                commands.append(self.ampd.moveid(group[0], to) if k == 1 else self.ampd.move(f'{start}:{start + k}', to))
+            i += k
+
+        for p, (Id, key) in enumerate(target):
+            if Id is None:
+                commands.append(self.ampd.add(key, p))
+
+        return commands
 
     @ampd.task
     async def _run(self, commands):
-        await self.ampd.command_list(commands)
+        # Positions in the plan are relative to the previous commands, so chunks must stay in order.
+        for i in range(0, len(commands), mixins.QUEUE_ADD_CHUNK_SIZE):
+            await self.ampd.command_list(commands[i:i + mixins.QUEUE_ADD_CHUNK_SIZE])
+
+
+class QueueIndex:
+    # Id and file lookups into the play queue, kept in step with playlistinfo.
+    def __init__(self):
+        self.Ids = []
+        self.keys = []
+        self.Id_positions = {}
+        self.key_positions = {}
+
+    def update(self, songs):
+        start = len(self.Ids)
+        for position, (Id, song) in enumerate(zip(self.Ids, songs)):
+            if Id != song['Id']:
+                start = position
+                break
+        else:
+            start = min(start, len(songs))
+
+        # Positions are dropped from the end, so each one is the last of its key's list.
+        for position in reversed(range(start, len(self.Ids))):
+            del self.Id_positions[self.Ids[position]]
+            positions = self.key_positions[self.keys[position]]
+            positions.pop()
+            if not positions:
+                del self.key_positions[self.keys[position]]
+        del self.Ids[start:], self.keys[start:]
+
+        for position in range(start, len(songs)):
+            Id = songs[position]['Id']
+            key = songs[position]['file']
+            self.Ids.append(Id)
+            self.keys.append(key)
+            self.Id_positions[Id] = position
+            self.key_positions.setdefault(key, []).append(position)
+
+    def find_Id(self, key):
+        positions = self.key_positions.get(key)
+        return None if positions is None else self.Ids[positions[0]]
 
 
 class QueueWidget(ViewWithCopyPasteSong):
     current_Id = GObject.Property()
 
-    def __init__(self, transaction_manager, **kwargs):
+    def __init__(self, transaction_manager, queue_index, **kwargs):
+        self.queue_index = queue_index
         self.lock = transaction_manager.lock
         self.unlock = transaction_manager.unlock
         self.add_items = transaction_manager.add_items
@@ -145,6 +269,11 @@ class QueueWidget(ViewWithCopyPasteSong):
     def action_go_to_current_cb(self, action, parameter):
         if self.current_Id is None:
             return
+        if not self.filtering:
+            position = self.queue_index.Id_positions.get(self.current_Id)
+            if position is not None:
+                self.scroll_to(position)
+            return
         for position, item_ in enumerate(self.item_selection_model):
             if item_.Id == self.current_Id:
                 self.scroll_to(position)
@@ -159,9 +288,6 @@ class __unit__(cleanup.CleanupCssMixin, mixins.UnitServerMixin, mixins.UnitCompo
     queue_position = GObject.Property()
     current_Id = GObject.Property()
 
-    TITLE = _("Play Queue")
-    KEY = '1'
-
     CSS = f'''
     columnview.queue > listview > row > cell.{QUEUE_PRIORITY_CSS_PREFIX}- {{
       background: rgba(0,255,0,0.5);
@@ -182,12 +308,21 @@ class __unit__(cleanup.CleanupCssMixin, mixins.UnitServerMixin, mixins.UnitCompo
         self.css_provider.load_from_string(self.CSS)
 
         self.queue_model = item.ItemListStore(item_type=QueueSongItem)
+        self.queue_index = QueueIndex()
+        self.queue_totals = item.ItemTotals(self.queue_model)
         item.setup_find_duplicate_items(self.queue_model, ['Title'])
 
-        self.transaction_manager = QueueTransactionManager(self.queue_model, self.ampd)
+        self.transaction_manager = QueueTransactionManager(self.queue_model, self.ampd_bulk)
+
+        self.queue_state = None
+        self.unit_server.register_standby_state('queue', ampd.PLAYLIST, self.refresh_queue_state)
+
+    def cleanup(self):
+        self.unit_server.unregister_standby_state('queue')
+        super().cleanup()
 
     def new_widget(self):
-        queue = QueueWidget(transaction_manager=self.transaction_manager, fields=self.unit_song.fields, separator=self.unit_database.separator, item_model=self.queue_model)
+        queue = QueueWidget(transaction_manager=self.transaction_manager, queue_index=self.queue_index, fields=self.unit_song.fields, separator=self.unit_database.separator, item_model=self.queue_model)
 
         queue.add_context_menu_actions(self.generate_priority_actions(queue), 'priority', _("Priority for random mode"), submenu=True)
         queue.add_context_menu_actions(self.generate_queue_actions(), 'queue-general', _("General queue operations"), protect=self.unit_persistent.protect)
@@ -196,7 +331,7 @@ class __unit__(cleanup.CleanupCssMixin, mixins.UnitServerMixin, mixins.UnitCompo
         queue.connect_clean(queue.item_view, 'activate', self.view_activate_cb)
         self.bind_property('current-Id', queue, 'current-Id', GObject.BindingFlags.SYNC_CREATE)
         queue.set_position(self.queue_position)
-        queue.totals_store = queue.item_model
+        queue.totals = self.queue_totals
 
         queue.add_context_menu_actions(self.generate_foreign_playlist_actions(queue), 'foreign-playlist', self.TITLE)
         queue.add_context_menu_actions(self.generate_foreign_tanda_actions(queue), 'foreign-tanda', self.TITLE)
@@ -236,10 +371,12 @@ class __unit__(cleanup.CleanupCssMixin, mixins.UnitServerMixin, mixins.UnitCompo
     @ampd.task
     async def client_connected_cb(self, client):
         self.set_cursor = True
+        self.queue_state = self.unit_server.take_standby_state('queue')
         try:
             while True:
-                songs = await self.ampd.playlistinfo()
-                misc.songs_set_fields(songs)
+                self.queue_state = await self.refresh_queue_state(self.ampd, self.queue_state)
+                songs = self.queue_state[1]
+                self.queue_index.update(songs)
                 self.queue_model.set_values(songs)
                 if self.set_cursor:
                     self.queue_position = self.cursor_by_profile.get(self.unit_server.server_profile)
@@ -248,9 +385,30 @@ class __unit__(cleanup.CleanupCssMixin, mixins.UnitServerMixin, mixins.UnitCompo
                     self.queue_position = None
                 await self.ampd.idle(ampd.PLAYLIST)
         finally:
+            if self.queue_state is not None:
+                self.unit_server.stash_standby_state('queue', self.queue_state)
+                self.queue_state = None
+            self.queue_index.update([])
             self.queue_model.remove_all()
             self.queue_position = None
 
+    @staticmethod
+    async def refresh_queue_state(executor, state):
+        # State is (queue version, songs), brought up to date with plchanges when possible.
+        if state is not None:
+            version, songs = state
+            status, changes = await executor.command_list([executor.status(), executor.plchanges(version)])
+            length = int(status['playlistlength'])
+            songs = songs[:length] + [None] * (length - len(songs))
+            for song in changes:
+                songs[int(song['Pos'])] = song
+            if None not in songs:
+                misc.songs_set_fields(changes)
+                return status['playlist'], songs
+        status, songs = await executor.command_list([executor.status(), executor.playlistinfo()])
+        misc.songs_set_fields(songs)
+        return status['playlist'], songs
+
     def notify_queue_position_cb(self, pspec, queue):
         queue.set_position(self.queue_position)
 
@@ -276,11 +434,12 @@ class __unit__(cleanup.CleanupCssMixin, mixins.UnitServerMixin, mixins.UnitCompo
     @ampd.task
     async def view_activate_cb(self, item_view, position):
         if not self.unit_persistent.protect_active:
-            await self.ampd.playid(item_view.get_model()[position].Id)
+            await self.ampd_interactive.playid(item_view.get_model()[position].Id)
 
     def remove_ids(self, ids):
-        return self.ampd.command_list(map(self.ampd.deleteid, ids))
+        return self.ampd_bulk.command_list(map(self.ampd.deleteid, ids))
 
     @ampd.task
     async def add_items(self, position, keys):
-        await self.ampd.command_list(self.ampd.add(key, position) for key in reversed(keys))
+        for i in range(0, len(keys), mixins.QUEUE_ADD_CHUNK_SIZE):
+            await self.ampd_bulk.command_list(self.ampd.add(key, position + i + j) for j, key in enumerate(keys[i:i + mixins.QUEUE_ADD_CHUNK_SIZE]))
@@ -56,9 +56,6 @@ class SearchWidget(compound.WidgetWithEntry):
 
 
 class __unit__(mixins.UnitComponentQueueActionMixin, mixins.UnitComponentPlaylistActionMixin, unit.Unit):
-    TITLE = _("Search")
-    KEY = '3'
-
     def __init__(self, manager):
         super().__init__(manager)
         self.require('song')
@@ -91,7 +88,7 @@ class __unit__(mixins.UnitComponentQueueActionMixin, mixins.UnitComponentPlaylis
             find = False
         condition = sum((['any', s] if '=' not in s else s.split('=', 1) for s in self.parse(query)), [])
         if condition:
-            songs = await (self.ampd.find if find else self.ampd.search)(*condition)
+            songs = await (self.ampd_bulk.find if find else self.ampd_bulk.search)(*condition)
             misc.songs_set_fields(songs)
             view.item_model.set_values(songs)
 
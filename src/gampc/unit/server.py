@@ -17,19 +17,131 @@
 
 
 import asyncio
+import collections
+import random
+import time
 
 from gi.repository import GObject
+from gi.repository import Gio
 
 import ampd
 
 from ..util import action
 from ..util import config
+from ..util import telemetry
 from ..util import unit
 from ..util.logger import logger
 
 from . import mixins
 
 
+# Extra connections, so that long commands do not hold up the idle listener or each other.
+LANES = ('interactive', 'bulk')
+
+
+DISCONNECT_REASONS = {getattr(ampd.Client, name): name[len('DISCONNECT_'):].lower() for name in dir(ampd.Client) if name.startswith('DISCONNECT_')}
+
+
+class TelemetryClient(ampd.ClientGLib):
+    def __init__(self, telemetry, lane):
+        super().__init__()
+        self.telemetry = telemetry
+        self.lane = lane
+
+    def _send(self, request_):
+        super()._send(request_)
+        self.telemetry.request_sent(self.lane, request_, len(self._active_queue))
+
+
+class ReconnectScheduler:
+    # Exponential backoff with jitter, so that clients do not all hit a recovering server at once.
+    def __init__(self, connect, first=0.5, maximum=60.0):
+        self.connect = connect
+        self.first = first
+        self.maximum = maximum
+        self.attempts = 0
+        self.delay = None
+        self.task = None
+
+    def schedule(self):
+        self.cancel()
+        delay = min(self.maximum, self.first * 2 ** self.attempts)
+        self.delay = random.uniform(delay / 2, delay)
+        self.attempts += 1
+        self.task = self.run(self.delay)
+
+    def retry_now(self):
+        if self.task is not None:
+            self.cancel()
+            self.task = self.run(0)
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self.delay = None
+
+    def reset(self):
+        self.cancel()
+        self.attempts = 0
+
+    @ampd.task
+    async def run(self, delay):
+        await asyncio.sleep(delay)
+        self.task = None
+        self.delay = None
+        await self.connect()
+
+
+class LaneExecutor:
+    # Sends requests through a lane connection, or through the main one while the lane is down.
+    def __init__(self, lane, main):
+        self.lane = lane
+        self.main = main
+
+    def __getattr__(self, name):
+        return getattr(self.lane if self.lane.get_is_connected() else self.main, name)
+
+    def sub_executor(self):
+        return LaneExecutor(self.lane.sub_executor(), self.main.sub_executor())
+
+    def close(self):
+        self.lane.close()
+        self.main.close()
+
+
+class Standby:
+    # Connection kept to a recently used profile, so that units can leave their state there and find it up to date.
+    def __init__(self, address, refreshers, disconnected_cb):
+        self.state = {}
+        self.client = ampd.ClientGLib()
+        self.client.connect('client-disconnected', self.client_disconnected_cb, disconnected_cb)
+        self.ampd = self.client.executor.sub_executor()
+        asyncio.create_task(self.client.connect_to_server(address))
+        self.watch(refreshers)
+
+    async def close(self):
+        self.state.clear()
+        await self.client.close()
+
+    @ampd.task
+    async def watch(self, refreshers):
+        while True:
+            events = await self.ampd.idle(ampd.ANY)
+            for name in list(self.state):
+                if name in refreshers and events & refreshers[name][0]:
+                    value = await refreshers[name][1](self.ampd, self.state[name])
+                    if value is None:
+                        self.state.pop(name, None)
+                    else:
+                        self.state[name] = value
+
+    def client_disconnected_cb(self, client, reason, message, disconnected_cb):
+        self.state.clear()
+        if reason not in (ampd.Client.DISCONNECT_RECONNECT, ampd.Client.DISCONNECT_SHUTDOWN):
+            disconnected_cb(self)
+
+
 class Profile:
     def __init__(self, arg):
         if '=' in arg:
@@ -48,19 +160,35 @@ class __unit__(mixins.UnitConfigMixin, unit.Unit):
                          config.Dict(
                              server_profile=config.Item(str, default=''),
                              server_profile_previous=config.Item(str, default=''),
+                             # Each lane is one more connection to the server, each standby one more to another server.
+                             lanes=config.Item(bool, default=True),
+                             standby_profiles=config.Item(int, default=0, is_valid=lambda value: value >= 0),
                          ))
 
-        self.ampd_client = ampd.ClientGLib()
+        self.telemetry = telemetry.Telemetry()
+        self.reconnect = ReconnectScheduler(self.reconnect_cb)
+        self.connect_start = None
+
+        self.ampd_client = TelemetryClient(self.telemetry, 'main')
         self.connect_clean(self.ampd_client, 'client-connected', self.client_connected_cb)
         self.connect_clean(self.ampd_client, 'client-disconnected', self.client_disconnected_cb)
 
         self.ampd = self.ampd_client.executor.sub_executor()
 
+        self.ampd_lanes = {lane: TelemetryClient(self.telemetry, lane) for lane in LANES} if self.config['lanes'] else {}
+        for client in self.ampd_lanes.values():
+            self.connect_clean(client, 'client-disconnected', self.lane_disconnected_cb)
+
         self.ampd_server_properties = ampd.ServerPropertiesGLib(self.ampd_client.executor)
         self.connect_clean(self.ampd_server_properties, 'server-error', self.server_error_cb)
         self.connect_clean(self.ampd_server_properties, 'notify::updating-db', self.set_server_label)
 
         self.want_to_connect = False
+        self.connect_clean(Gio.NetworkMonitor.get_default(), 'network-changed', self.network_changed_cb)
+
+        self.standbys = collections.OrderedDict()
+        self.standby_refreshers = {}
+        self.connected_profile = None
 
         self.server_profile = self.config['server_profile']
         self.server_profile_previous = self.config['server_profile_previous'] or self.server_profile
@@ -73,8 +201,11 @@ class __unit__(mixins.UnitConfigMixin, unit.Unit):
 
     def cleanup(self):
         self.want_to_connect = False
-        asyncio.get_event_loop().run_until_complete(self.ampd_client.close())
+        self.reconnect.cancel()
+        asyncio.get_event_loop().run_until_complete(asyncio.gather(*(client.close() for client in self.all_clients()), *(standby.close() for standby in self.standbys.values())))
+        del self.standbys
         del self.ampd_client
+        del self.ampd_lanes
         del self.ampd_server_properties
         super().cleanup()
 
@@ -89,16 +220,34 @@ class __unit__(mixins.UnitConfigMixin, unit.Unit):
         for name in ampd.OPTION_NAMES:
             yield action.PropertyActionInfo(name, self.ampd_server_properties, arg_format='i')
 
+    def all_clients(self):
+        yield self.ampd_client
+        yield from self.ampd_lanes.values()
+
+    def lane_executor(self, lane):
+        if lane not in self.ampd_lanes:
+            return self.ampd_client.executor.sub_executor()
+        return LaneExecutor(self.ampd_lanes[lane].executor.sub_executor(), self.ampd_client.executor.sub_executor())
+
     def ampd_connect(self, *args):
         self.want_to_connect = True
-        asyncio.create_task(self.ampd_client.connect_to_server(self.profile.address))
+        self.reconnect.reset()
+        asyncio.create_task(self.connect_to_server())
         self.set_server_label()
 
     def ampd_disconnect(self, *args):
         self.want_to_connect = False
-        asyncio.create_task(self.ampd_client.disconnect_from_server())
+        self.reconnect.reset()
+        for client in self.all_clients():
+            asyncio.create_task(client.disconnect_from_server())
         self.set_server_label()
 
+    async def connect_to_server(self):
+        self.connect_start = time.perf_counter()
+        # Lanes first, so that they are ready when units see the main connection.
+        await asyncio.gather(*(client.connect_to_server(self.profile.address) for client in self.ampd_lanes.values()))
+        await self.ampd_client.connect_to_server(self.profile.address)
+
     @ampd.task
     async def connect_to_previous(self, *args):
         self.server_profile = self.server_profile_previous
@@ -109,28 +258,85 @@ class __unit__(mixins.UnitConfigMixin, unit.Unit):
         #     await self.ampd.idle(ampd.IDLE)
         await self.ampd.update()
 
+    def register_standby_state(self, name, events, refresh):
+        # refresh(executor, value) is awaited on a standby connection after matching events, and returns the new value or None.
+        self.standby_refreshers[name] = events, refresh
+
+    def unregister_standby_state(self, name):
+        del self.standby_refreshers[name]
+        for standby in self.standbys.values():
+            standby.state.pop(name, None)
+
+    def stash_standby_state(self, name, value):
+        standby = self.standbys.get(self.connected_profile)
+        if standby is not None and name in self.standby_refreshers:
+            standby.state[name] = value
+
+    def take_standby_state(self, name):
+        standby = self.standbys.get(self.server_profile)
+        return None if standby is None else standby.state.pop(name, None)
+
+    def update_standbys(self):
+        if self.config['standby_profiles'] and self.server_profile not in self.standbys:
+            self.standbys[self.server_profile] = Standby(self.profile.address, self.standby_refreshers, self.standby_disconnected_cb)
+        if self.server_profile in self.standbys:
+            self.standbys.move_to_end(self.server_profile)
+        # The current profile and the previous ones.
+        limit = self.config['standby_profiles'] and self.config['standby_profiles'] + 1
+        while len(self.standbys) > limit:
+            asyncio.create_task(self.standbys.popitem(last=False)[1].close())
+
+    def standby_disconnected_cb(self, standby):
+        for profile, other in list(self.standbys.items()):
+            if other is standby:
+                del self.standbys[profile]
+                asyncio.create_task(standby.close())
+
     def client_connected_cb(self, client):
+        self.reconnect.reset()
+        if self.connect_start is not None:
+            self.telemetry.connected(time.perf_counter() - self.connect_start)
+            self.connect_start = None
+        self.connected_profile = self.server_profile
+        self.update_standbys()
         logger.info(_("Connected to {address} [protocol version {protocol}]").format(address=self.profile.name, protocol=self.ampd.get_protocol_version()))
         self.set_server_label()
 
     def client_disconnected_cb(self, client, reason, message):
         if reason == ampd.Client.DISCONNECT_RECONNECT:
             return
-        elif reason == ampd.Client.DISCONNECT_PASSWORD:
+        self.telemetry.disconnected(client.lane, DISCONNECT_REASONS.get(reason, str(reason)))
+        if reason == ampd.Client.DISCONNECT_PASSWORD:
             logger.error(_("Invalid password"))
             return
         elif reason == ampd.Client.DISCONNECT_FAILED_CONNECT:
             logger.error(_("Connection failed: {message}").format(message=message or _("reason unknown")))
         else:
-            logger.info(_("Disconnected"))
+            logger.info(_("Disconnected ({telemetry})").format(telemetry=self.telemetry.summary()))
         if self.want_to_connect:
-            self._reconnect()
+            self.reconnect.schedule()
         self.set_server_label()
 
+    async def reconnect_cb(self):
+        self.telemetry.reconnect_attempts += 1
+        self.set_server_label()
+        await self.connect_to_server()
+
+    def network_changed_cb(self, monitor, available):
+        if available and self.want_to_connect and not self.ampd.get_is_connected():
+            self.reconnect.retry_now()
+
+    def lane_disconnected_cb(self, client, reason, message):
+        if reason != ampd.Client.DISCONNECT_RECONNECT:
+            self.telemetry.disconnected(client.lane, DISCONNECT_REASONS.get(reason, str(reason)))
+        if reason in (ampd.Client.DISCONNECT_ERROR, ampd.Client.DISCONNECT_FAILED_CONNECT) and self.want_to_connect and self.ampd.get_is_connected():
+            self._reconnect_lane(client)
+
     @ampd.task
-    async def _reconnect(self):
+    async def _reconnect_lane(self, client):
         await asyncio.sleep(1)
-        await self.ampd_client.connect_to_server(self.profile.address)
+        if self.want_to_connect and self.ampd.get_is_connected():
+            await client.connect_to_server(self.profile.address)
 
     def server_error_cb(self, client, error):
         logger.error(_("Server error: {error}").format(error=error))
@@ -138,6 +344,8 @@ class __unit__(mixins.UnitConfigMixin, unit.Unit):
     def set_server_label(self, *args):
         if not self.want_to_connect:
             self.server_label = _("Not connected")
+        elif self.reconnect.delay is not None:
+            self.server_label = _("Reconnecting to {profile} in {delay:.0f} s (attempt {attempt})").format(profile=self.profile.name, delay=self.reconnect.delay, attempt=self.reconnect.attempts)
         elif not self.ampd.get_is_connected():
             self.server_label = _("Connecting to {profile}").format(profile=self.profile.name)
         else:
@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from ..util import misc
 from ..util import unit
 
 from ..view import field
@@ -32,15 +33,15 @@ class __unit__(mixins.UnitConfigMixin, unit.Unit):
             'AlbumArtist': dict(title=_("Album artist")),
             'Artist': dict(title=_("Artist")),
             'Composer': dict(title=_("Composer")),
-            'Date': dict(title=_("Date")),
-            'Disc': dict(title=_("Disc")),
+            'Date': dict(title=_("Date"), sort_key=misc.sort_key_date),
+            'Disc': dict(title=_("Disc"), sort_key=misc.sort_key_number),
             'file': dict(title=_("File")),
             'Genre': dict(title=_("Genre")),
             'Last_Modified': dict(title=_("Last modified")),
             'Performer': dict(title=_("Performer")),
-            'Track': dict(title=_("Track")),
+            'Track': dict(title=_("Track"), sort_key=misc.sort_key_number),
             'Title': dict(title=_("Title")),
-            'Duration': dict(title=_("Duration")),
+            'Duration': dict(title=_("Duration"), sort_key=misc.sort_key_time),
             'Extension': dict(title=_("Extension")),
         }
 
@@ -95,11 +95,8 @@ class StreamDatabase(db.Database):
 
 
 class __unit__(mixins.UnitConfigMixin, mixins.UnitComponentQueueActionMixin, unit.Unit):
-    TITLE = _("Internet Streams")
-    KEY = '4'
-
     def __init__(self, manager):
-        super().__init__(manager, config.Dict(fields=field.get_fields_config()))
+        super().__init__(manager, config.Dict(fields=field.get_fields_config(), history_limit=editstack.get_history_limit_config()))
 
         self.require('persistent')
 
@@ -117,9 +114,12 @@ class __unit__(mixins.UnitConfigMixin, mixins.UnitComponentQueueActionMixin, uni
         #     for key in stream:
         #         if stream[key] is None:
         #             stream[key] = ''
-        self.edit_stack = editstack.EditStack(streams, item_type=item.SongItem)
+        self.edit_stack = editstack.EditStack(streams, item_type=item.SongItem, history_limit=self.config['history_limit'])
         item.setup_find_duplicate_items(self.edit_stack.item_model, ['file'])
 
+    def can_release(self):
+        return not self.edit_stack.modified
+
     def factory(self):
         component = super().factory()
         component.connect_clean(self.edit_stack, 'notify::modified', self.notify_modified_cb, component)
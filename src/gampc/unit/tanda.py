@@ -18,6 +18,7 @@
 
 import asyncio
 import datetime
+import functools
 import re
 
 from gi.repository import GLib
@@ -75,14 +76,17 @@ class TandaItem(item.Item):
     edit_stack = GObject.Property()
     modified = GObject.Property(type=bool, default=False)
 
-    def __init__(self, **kwargs):
+    def __init__(self, *, value=None, history_limit=None, **kwargs):
         super().__init__(**kwargs)
+        self.history_limit = history_limit
         trigger = Gtk.KeyvalTrigger(keyval=Gdk.KEY_f, modifiers=Gdk.ModifierType.CONTROL_MASK | Gdk.ModifierType.ALT_MASK)
         self.fill_shortcut = Gtk.Shortcut(trigger=trigger, action=Gtk.CallbackAction.new(self.fill_cb))
+        if value is not None:
+            self.new_value(value)
 
     def new_value(self, value):
         self.tandaid = value.pop('tandaid')
-        self.edit_stack = editstack.EditStack(value['_songs'], self, item_type=item.SongItem)
+        self.edit_stack = editstack.EditStack(value['_songs'], self, item_type=item.SongItem, history_limit=self.history_limit)
         self.edit_stack.bind_property('modified', self, 'modified')
         super().new_value(value)
 
@@ -611,14 +615,12 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
 
     MISSING_SONG_FIELDS = 'Artist', 'Title', 'Date', 'Performer'
 
-    TITLE = _("Tandas")
-    KEY = '6'
-
     def __init__(self, manager):
         super().__init__(manager,
                          config.Dict(
                              paned=TandaWidget.get_paned_config(),
                              fields=field.get_fields_config(),
+                             history_limit=editstack.get_history_limit_config(),
                          ))
 
         self.require('song')
@@ -634,23 +636,23 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
             'Performer': dict(title=_("Performer"), editable=True),
             'Comment': dict(title=_("Comment"), editable=True),
             'Description': dict(title=_("Description"), editable=True),
-            'Note': dict(title=_("Note"), min_width=30, editable=True),
-            'Rhythm': dict(title=_("Rhythm"), min_width=30, editable=True),
-            'Energy': dict(title=_("Energy"), min_width=30, editable=True),
-            'Speed': dict(title=_("Speed"), min_width=30, editable=True),
+            'Note': dict(title=_("Note"), min_width=30, sort_key=misc.sort_key_number, editable=True),
+            'Rhythm': dict(title=_("Rhythm"), min_width=30, sort_key=misc.sort_key_number, editable=True),
+            'Energy': dict(title=_("Energy"), min_width=30, sort_key=misc.sort_key_number, editable=True),
+            'Speed': dict(title=_("Speed"), min_width=30, sort_key=misc.sort_key_number, editable=True),
             'Emotion': dict(title=_("Emotion"), min_width=30, editable=True),
-            'Level': dict(title=_("Level"), min_width=30, editable=True),
+            'Level': dict(title=_("Level"), min_width=30, sort_key=misc.sort_key_number, editable=True),
             'Last_Modified': dict(title=_("Last modified"), editable=True),
             'Last_Played': dict(title=_("Last played"), editable=True),
             # XXXXXXX
-            'Duration': dict(title=_("Duration")),
+            'Duration': dict(title=_("Duration"), sort_key=misc.sort_key_time),
             'First_Song': dict(title=_("First song")),
             'Years': dict(title=_("Years")),
-            'Last_Played_Weeks': dict(title=_("Weeks since last played"), min_width=30, sort_default=float('inf')),
+            'Last_Played_Weeks': dict(title=_("Weeks since last played"), min_width=30, sort_key=misc.sort_key_number, sort_default=float('inf')),
         }
         self.fields = field.FieldsInfo(self.config['fields'], fields)
 
-        self.tanda_model = item.ItemListStore(item_type=TandaItem)
+        self.tanda_model = item.ItemListStore(item_type=functools.partial(TandaItem, history_limit=self.config['history_limit']))
         self.tanda_sorter = Gtk.CustomSorter.new(self.tanda_sort_func)
         self.tanda_sort_model = Gtk.SortListModel(model=self.tanda_model, sorter=self.tanda_sorter)
         self.queue_model = item.ItemListStore(item_type=item.SongItem)
@@ -666,6 +668,9 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
         self.tanda_sorter.set_sort_func(None)
         super().cleanup()
 
+    def can_release(self):
+        return not any(tanda.modified for tanda in self.tanda_model)
+
     def factory(self):
         component = super().factory()
         component.connect_clean(self, 'verify-progress', self.verify_progress_cb, component)
@@ -744,7 +749,7 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
 
     @ampd.task
     async def verify_song(self, window, song, total, done, updated, replaced, problem):
-        real_song = await self.ampd.find('file', song['file'])
+        real_song = await self.ampd_bulk.find('file', song['file'])
         if real_song:
             real_song = real_song[0]
             changed = [(name, song.get(name), real_song.get(name)) for name in self.song_field_names if song.get(name) != real_song.get(name)]
@@ -753,7 +758,7 @@ class __unit__(mixins.UnitConfigMixin, cleanup.CleanupCssMixin, mixins.UnitCompo
                 logger.info(_("Updating metadata for '{file}': ").format_map(song) + ", ".join("{0} {1} => {2}".format(*t) for t in changed))
                 updated.append(song['file'])
         else:
-            maybe_song = await self.ampd.find(*sum(([field, song.get(field, '')] for field in self.MISSING_SONG_FIELDS), []))
+            maybe_song = await self.ampd_bulk.find(*sum(([field, song.get(field, '')] for field in self.MISSING_SONG_FIELDS), []))
             if len(maybe_song) == 1:
                 logger.info(_("Replacing song:"))
                 logger.info("- " + song['file'])
@@ -26,6 +26,8 @@ from . import misc
 class BaseItem(GObject.Object):
     value = GObject.Property()
 
+    sort_keys_value = None
+
     def __init__(self, *, value=None):
         super().__init__()
         if value is not None:
@@ -37,6 +39,17 @@ class BaseItem(GObject.Object):
     def get_field(self, name, default=None):
         return self.value.get(name, default)
 
+    def get_sort_key(self, name, default, key_func):
+        # Cached until the item gets a new value, however it is set.
+        if self.sort_keys_value is not self.value:
+            self.sort_keys_value = self.value
+            self.sort_keys = {}
+        key = self.sort_keys.get(name)
+        if key is None:
+            value = self.value.get(name)
+            key = self.sort_keys[name] = default if value is None else key_func(value)
+        return key
+
 
 class Item(BaseItem):
     def __init__(self, **kwargs):
@@ -78,6 +91,7 @@ class SongItem(Item):
 
     def new_value(self, value):
         self.duplicate = None
+        self.duration = float(value.get('duration', 0))
         super().new_value(value)
 
     def get_binders(self):
@@ -135,6 +149,10 @@ class WithItemModelMixin:
 
 
 class ItemListStore(GObject.Object, Gio.ListModel):
+    __gsignals__ = {
+        'values-changed': (GObject.SIGNAL_RUN_FIRST, None, (int, int)),
+    }
+
     def __init__(self, *, item_type, values=None):
         super().__init__()
         self.item_type = item_type
@@ -170,6 +188,8 @@ class ItemListStore(GObject.Object, Gio.ListModel):
         add = len(values)
         for i in range(min(add, remove)):
             self.items[pos + i].new_value(values[i])
+        if min(add, remove):
+            self.emit('values-changed', pos, min(add, remove))
         if remove >= add:
             self.items[pos + add: pos + remove] = []
             self.items_changed(pos + add, remove - add, 0)
@@ -178,9 +198,37 @@ class ItemListStore(GObject.Object, Gio.ListModel):
             self.items_changed(pos + remove, 0, add - remove)
 
 
+class ItemTotals(GObject.Object):
+    n_items = GObject.Property(type=int, default=0)
+    duration = GObject.Property(type=float, default=0.0)
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.durations = []
+        model.connect('items-changed', self.__class__.items_changed_cb, self)
+        model.connect('values-changed', self.__class__.values_changed_cb, self)
+        self.splice(0, 0, model.get_n_items())
+
+    @staticmethod
+    def items_changed_cb(model, position, removed, added, self):
+        self.splice(position, removed, added)
+
+    @staticmethod
+    def values_changed_cb(model, position, n, self):
+        self.splice(position, n, n)
+
+    def splice(self, position, removed, added):
+        durations = [self.model.items[i].duration for i in range(position, position + added)]
+        delta = sum(durations) - sum(self.durations[position:position + removed])
+        self.durations[position:position + removed] = durations
+        self.n_items = len(self.durations)
+        self.duration = self.duration + delta if self.durations else 0.0
+
+
 class ItemValueTransfer(misc.TransferBase):
-    def __init__(self, items):
-        super().__init__(value=[item.value for item in items])
+    def __init__(self, values):
+        super().__init__(value=values)
 
 
 class SongItemTransfer(ItemValueTransfer):
@@ -188,17 +236,42 @@ class SongItemTransfer(ItemValueTransfer):
 
 
 class ItemFileTransfer(misc.TransferBase):
-    def __init__(self, items):
-        super().__init__(value=[item.value['file'] for item in items])
+    def __init__(self, values):
+        super().__init__(value=[value['file'] for value in values])
 
 
 class ItemStringTransfer(ItemFileTransfer):
-    def get_content(self):
-        return Gdk.ContentProvider.new_for_value(repr(self.value))
+    @classmethod
+    def get_content_type(cls):
+        return GObject.TYPE_STRING
+
+    def get_content_value(self):
+        return repr(self.value)
+
+
+class TransferContentProvider(Gdk.ContentProvider):
+    # Only the transfer asked for is built, from the item values as they were when copied.
+    def __init__(self, values, transfers):
+        super().__init__()
+        self.values = values
+        self.transfers = transfers
+
+    def do_ref_formats(self):
+        builder = Gdk.ContentFormatsBuilder()
+        for transfer in self.transfers:
+            builder.add_gtype(transfer.get_content_type())
+        return builder.to_formats()
+
+    def do_get_value(self, value):
+        for transfer in self.transfers:
+            if value.g_type == transfer.get_content_type():
+                value.set_value(transfer(self.values).get_content_value())
+                return True
+        return Gdk.ContentProvider.do_get_value(self, value)
 
 
-def transfer_union(value, *transfers):
-    return Gdk.ContentProvider.new_union([transfer(value).get_content() for transfer in transfers])
+def transfer_union(items, *transfers):
+    return TransferContentProvider([item.value for item in items], transfers)
 
 
 def setup_find_duplicate_items(model, test_fields):
@@ -44,6 +44,29 @@ def format_time(time):
     return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes:02}:{seconds:02}"
 
 
+def sort_key_number(value):
+    match = re.match('\\s*(\\d+(?:\\.\\d*)?)', str(value))
+    return float(match[1]) if match else float('-inf')
+
+
+def sort_key_date(value):
+    parts = re.findall('\\d+', value)[:3]
+    if not parts:
+        return float('-inf')
+    parts += ['0'] * (3 - len(parts))
+    return float(parts[0]) * 10000 + float(parts[1]) * 100 + float(parts[2])
+
+
+def sort_key_time(value):
+    seconds = 0.0
+    try:
+        for part in value.split(':'):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return float('-inf')
+    return seconds
+
+
 def get_display():
     return Gdk.Display.get_default()
 
@@ -95,6 +118,25 @@ def create_task(coro, *args, **kwargs):
     return asyncio.create_task(coro(*args, **kwargs))
 
 
+class OccupiedSlots:
+    # Fenwick tree counting the occupied slots before a given one.
+    def __init__(self, size):
+        self.tree = [0] * (size + 1)
+
+    def add(self, slot, delta):
+        slot += 1
+        while slot < len(self.tree):
+            self.tree[slot] += delta
+            slot += slot & -slot
+
+    def count_before(self, slot):
+        total = 0
+        while slot > 0:
+            total += self.tree[slot]
+            slot -= slot & -slot
+        return total
+
+
 class FactoryBase(Gtk.SignalListItemFactory):
     def __init__(self):
         super().__init__()
@@ -138,7 +180,14 @@ class TransferBase(GObject.Object):
     value = GObject.Property()
 
     def get_content(self):
-        return Gdk.ContentProvider.new_for_value(self)
+        return Gdk.ContentProvider.new_for_value(self.get_content_value())
+
+    @classmethod
+    def get_content_type(cls):
+        return cls.__gtype__
+
+    def get_content_value(self):
+        return self
 
 
 def song_set_fields(song):
@@ -0,0 +1,125 @@
+"""Graphical Asynchronous Music Player Client."""
+
+# Copyright (C) Itaï BEN YAACOV
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Must not import gi: started before the package imports it.
+
+import builtins
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+
+OPTION = '--profile-startup'
+
+
+class StartupProfiler:
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        self.depth = 0
+        self.origin = time.perf_counter()
+        self.import_orig = None
+
+    def start(self):
+        tracemalloc.start()
+        self.import_orig = builtins.__import__
+        builtins.__import__ = self.import_
+        self.origin = time.perf_counter()
+
+    def stop(self):
+        if builtins.__import__ == self.import_:
+            builtins.__import__ = self.import_orig
+        tracemalloc.stop()
+
+    def import_(self, name, *args, **kwargs):
+        n_modules = len(sys.modules)
+        with self.measure('import', name) as record:
+            module = self.import_orig(name, *args, **kwargs)
+            if len(sys.modules) == n_modules:
+                record.clear()
+        return module
+
+    @contextlib.contextmanager
+    def measure(self, kind, name):
+        record = [kind, name, self.depth]
+        self.depth += 1
+        start = time.perf_counter()
+        memory = tracemalloc.get_traced_memory()[0]
+        try:
+            yield record
+        finally:
+            self.depth -= 1
+            if record:
+                record += [start - self.origin, time.perf_counter() - start, tracemalloc.get_traced_memory()[0] - memory]
+                self.records.append(record)
+
+    def write_report(self, file):
+        print(_("Startup profile: {total:.1f} ms").format(total=(time.perf_counter() - self.origin) * 1000), file=file)
+        print(f"{'kind':8} {'ms':>9} {'KiB':>9}  name", file=file)
+        for kind, name, depth, start, duration, memory in sorted(self.records, key=lambda record: record[4], reverse=True):
+            print(f"{kind:8} {duration * 1000:9.2f} {memory / 1024:9.1f}  {'  ' * depth}{name}", file=file)
+
+    def write_trace(self, file):
+        pid = os.getpid()
+        events = [dict(name=name, cat=kind, ph='X', ts=start * 1e6, dur=duration * 1e6, pid=pid, tid=1, args=dict(depth=depth, alloc=memory))
+                  for kind, name, depth, start, duration, memory in self.records]
+        json.dump(dict(traceEvents=events, displayTimeUnit='ms'), file)
+
+    def report(self):
+        self.stop()
+        if self.path == '-':
+            self.write_report(sys.stderr)
+        else:
+            with open(self.path, 'w') as f:
+                self.write_trace(f)
+
+
+profiler = None
+
+
+def start(argv):
+    global profiler
+    for i, arg in enumerate(argv):
+        if arg == OPTION and i + 1 < len(argv):
+            path = argv[i + 1]
+        elif arg.startswith(OPTION + '='):
+            path = arg[len(OPTION) + 1:]
+        else:
+            continue
+        profiler = StartupProfiler(path)
+        profiler.start()
+        return
+
+
+@contextlib.contextmanager
+def measure(kind, name):
+    if profiler is None:
+        yield
+    else:
+        with profiler.measure(kind, name):
+            yield
+
+
+def report():
+    global profiler
+    if profiler is not None:
+        profiler.report()
+        profiler = None
@@ -0,0 +1,233 @@
+"""Graphical Asynchronous Music Player Client."""
+
+# Copyright (C) Itaï BEN YAACOV
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import bisect
+import collections
+import time
+import weakref
+
+
+class Histogram:
+    # Rolling histogram of the last samples (milliseconds, or queue lengths).
+    BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, size=500):
+        self.samples = collections.deque(maxlen=size)
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0
+
+    def add(self, value):
+        if len(self.samples) == self.samples.maxlen:
+            self.counts[bisect.bisect_left(self.BOUNDS, self.samples[0])] -= 1
+        self.samples.append(value)
+        self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.total += 1
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def dump(self):
+        return dict(total=self.total,
+                    recent=len(self.samples),
+                    p50=self.percentile(50),
+                    p90=self.percentile(90),
+                    p99=self.percentile(99),
+                    max=max(self.samples, default=None),
+                    buckets={f'<={bound}' if bound is not None else f'>{self.BOUNDS[-1]}': count for bound, count in zip(self.BOUNDS + (None,), self.counts)})
+
+
+class CommandStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.reply_size = 0
+        self.total_time = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latency = Histogram()
+
+    def dump(self):
+        return dict(count=self.count,
+                    errors=self.errors,
+                    reply_size=self.reply_size,
+                    total_time=self.total_time,
+                    max_in_flight=self.max_in_flight,
+                    latency=self.latency.dump())
+
+
+class UnitStats:
+    def __init__(self):
+        self.commands = collections.defaultdict(CommandStats)
+        self.pending = weakref.WeakKeyDictionary()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def started(self, command, request_):
+        stats = self.commands[command]
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.in_flight, stats.max_in_flight)
+        self.in_flight += 1
+        self.max_in_flight = max(self.in_flight, self.max_in_flight)
+        # The start time is set when the request is sent.  A request dropped without completing is released when collected.
+        self.pending[request_] = [command, None, weakref.finalize(request_, self.release, command)]
+        request_.add_done_callback(self.done)
+
+    def sent(self, request_, start):
+        entry = self.pending.get(request_)
+        if entry is not None and entry[1] is None:
+            entry[1] = start
+
+    def release(self, command):
+        stats = self.commands[command]
+        stats.in_flight -= 1
+        self.in_flight -= 1
+        if not stats.count and not stats.in_flight:
+            del self.commands[command]
+
+    def forget(self, request_):
+        # Commands sent as part of a command list are accounted for by the list.
+        if request_ in self.pending:
+            command, start, finalizer = self.pending.pop(request_)
+            finalizer.detach()
+            self.release(command)
+
+    def done(self, request_):
+        if request_ not in self.pending:
+            return
+        command, start, finalizer = self.pending.pop(request_)
+        finalizer.detach()
+        stats = self.commands[command]
+        stats.in_flight -= 1
+        self.in_flight -= 1
+        if request_.cancelled():
+            return
+        stats.count += 1
+        if request_.exception() is not None:
+            stats.errors += 1
+            return
+        if start is not None:
+            latency = (time.perf_counter() - start) * 1000
+            stats.latency.add(latency)
+            stats.total_time += latency
+        reply = request_.result()
+        if isinstance(reply, (list, dict)):
+            stats.reply_size += len(reply)
+
+    def reset(self):
+        for command, stats in list(self.commands.items()):
+            if stats.in_flight:
+                self.commands[command] = CommandStats()
+                self.commands[command].in_flight = self.commands[command].max_in_flight = stats.in_flight
+            else:
+                del self.commands[command]
+        self.max_in_flight = self.in_flight
+
+    def dump(self):
+        return dict(in_flight=self.in_flight,
+                    max_in_flight=self.max_in_flight,
+                    commands={command: stats.dump() for command, stats in sorted(self.commands.items())})
+
+
+class InstrumentedExecutor:
+    # Records the requests made through an executor in the unit's statistics.
+    PLAIN = {'close', 'sub_executor', 'set_callbacks', 'get_is_connected', 'get_protocol_version', 'idle'}
+
+    def __init__(self, executor, stats):
+        self.executor = executor
+        self.stats = stats
+
+    def __getattr__(self, name):
+        attr = getattr(self.executor, name)
+        if name in self.PLAIN:
+            return attr
+
+        def request(*args):
+            request_ = attr(*args)
+            if name == 'command_list':
+                for command in request_._commands:
+                    self.stats.forget(command)
+            self.stats.started(name, request_)
+            return request_
+
+        return request
+
+    def sub_executor(self):
+        return InstrumentedExecutor(self.executor.sub_executor(), self.stats)
+
+
+class Telemetry:
+    def __init__(self):
+        self.units = collections.defaultdict(UnitStats)
+        self.commands = collections.defaultdict(Histogram)
+        self.connect_times = Histogram(50)
+        self.queue_depth = collections.defaultdict(Histogram)
+        self.connects = 0
+        self.disconnects = collections.defaultdict(collections.Counter)
+        self.reconnect_attempts = 0
+
+    def request_sent(self, lane, request_, depth):
+        # Called by the client as a request hits the wire.  Idle requests wait for events, so their time means nothing.
+        command = request_._commandline.split(None, 1)[0]
+        if command == 'idle':
+            return
+        elif command == 'command_list_ok_begin':
+            command = 'command_list'
+        start = time.perf_counter()
+        for stats in self.units.values():
+            stats.sent(request_, start)
+        self.queue_depth[lane].add(depth)
+        request_.add_done_callback(lambda request_: self.request_done(command, start, request_))
+
+    def request_done(self, command, start, request_):
+        if not request_.cancelled():
+            self.commands[command].add((time.perf_counter() - start) * 1000)
+
+    def connected(self, duration):
+        self.connects += 1
+        self.connect_times.add(duration * 1000)
+
+    def disconnected(self, lane, reason):
+        self.disconnects[lane][reason] += 1
+
+    def summary(self):
+        samples = [sample for histogram in self.commands.values() for sample in histogram.samples]
+        samples.sort()
+        rtt = f"{samples[len(samples) // 2]:.0f}/{samples[len(samples) * 9 // 10]:.0f} ms" if samples else "-"
+        # Only errors are drops: requested disconnects and failed attempts are not.
+        main = self.disconnects['main']
+        lane_drops = sum(counter['error'] for lane, counter in self.disconnects.items() if lane != 'main')
+        return _("{connects} connections, {drops} drops, {failed} failed connects, {lane_drops} lane drops, RTT p50/p90 {rtt}").format(
+            connects=self.connects, drops=main['error'], failed=main['failed_connect'], lane_drops=lane_drops, rtt=rtt)
+
+    def reset(self):
+        # Unit statistics are reset in place, since executors hold on to them.
+        for stats in self.units.values():
+            stats.reset()
+        self.commands.clear()
+
+    def dump(self):
+        return dict(units={unit: stats.dump() for unit, stats in sorted(self.units.items())},
+                    connects=self.connects,
+                    reconnect_attempts=self.reconnect_attempts,
+                    disconnects={lane: dict(counter) for lane, counter in self.disconnects.items()},
+                    connect_times=self.connect_times.dump(),
+                    queue_depth={lane: histogram.dump() for lane, histogram in self.queue_depth.items()},
+                    commands={command: histogram.dump() for command, histogram in sorted(self.commands.items())})
@@ -22,6 +22,7 @@ import importlib
 import collections
 
 from . import cleanup
+from . import profiler
 from .logger import logger
 
 
@@ -37,6 +38,10 @@ class Unit(cleanup.CleanupSignalMixin, GObject.Object):
 
         self.loaded_required = []
 
+    def can_release(self):
+        # Units loaded on demand are only released when they hold nothing worth keeping.
+        return True
+
     def cleanup(self):
         while self.loaded_required:
             self.manager._free_unit(self.loaded_required.pop())
@@ -57,6 +62,7 @@ class UnitManager(GObject.Object):
     def __init__(self):
         GObject.Object.__init__(self)
         self._target = []
+        self._loaded = []
         self._units = collections.OrderedDict()
         self._aggregators = []
 
@@ -68,20 +74,34 @@ class UnitManager(GObject.Object):
                 real_target.append(name)
             except UnitLoadError:
                 pass
-        for name in reversed(self._target):
+        for name in reversed(self._loaded + self._target):
             self._free_unit(name)
+        self._loaded = []
         self._target = real_target
         return real_target
 
     def get_unit(self, name):
         return self._units[name]
 
+    def load_unit(self, name):
+        # Units loaded on demand are kept until released or the target changes.
+        if name not in self._target and name not in self._loaded:
+            self._use_unit(name)
+            self._loaded.append(name)
+        return self._units[name]
+
+    def release_unit(self, name):
+        if name in self._loaded and self._units[name].can_release():
+            self._loaded.remove(name)
+            self._free_unit(name)
+
     def _use_unit(self, name):
         if name in self._units:
             unit = self._units[name]
         else:
-            unit_module = importlib.import_module('gampc.unit.' + name)
-            unit = self._units[name] = unit_module.__unit__(self)
+            with profiler.measure('unit', name):
+                unit_module = importlib.import_module('gampc.unit.' + name)
+                unit = self._units[name] = unit_module.__unit__(self)
             unit.use_count = 0
             for aggregator in self._aggregators:
                 aggregator.link(unit)
@@ -0,0 +1,136 @@
+"""Graphical Asynchronous Music Player Client."""
+
+# Copyright (C) Itaï BEN YAACOV
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from gi.repository import GLib
+
+import asyncio
+import collections
+import inspect
+import os
+import sys
+import threading
+import time
+import traceback
+
+from .logger import logger
+
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIN_THRESHOLD = 10
+
+
+class Stall:
+    def __init__(self, stack, coroutine):
+        self.stack = stack
+        self.coroutine = coroutine
+        self.task = None
+        # Outermost and innermost frames of our own code: the callback the main loop dispatched, and where it was stuck.
+        frames = [frame for frame in stack if frame.filename.startswith(PACKAGE_DIR) and os.path.basename(frame.filename) != '__main__.py']
+        self.entry = self.describe(frames[0]) if frames else _("no Python callback")
+        self.site = self.describe(frames[-1]) if frames else self.describe(stack[-1])
+
+    @staticmethod
+    def describe(frame):
+        filename = os.path.relpath(frame.filename, PACKAGE_DIR) if frame.filename.startswith(PACKAGE_DIR) else frame.filename
+        return f'{frame.name} ({filename}:{frame.lineno})'
+
+
+class Watchdog:
+    # A heartbeat runs on the main loop, and a thread looks at the main thread's stack when it is late.
+    def __init__(self, threshold):
+        self.threshold = max(threshold, MIN_THRESHOLD) / 1000
+        self.interval = min(self.threshold / 4, 0.05)
+        self.loop = asyncio.get_event_loop()
+        self.main_thread = threading.main_thread()
+        self.lock = threading.Lock()
+        self.beat = time.monotonic()
+        self.stall = None
+        self.stats = collections.defaultdict(lambda: [0, 0.0, 0.0])
+        self.stopping = threading.Event()
+        self.source = GLib.timeout_add(int(self.interval * 1000), self.heartbeat, priority=GLib.PRIORITY_HIGH)
+        self.thread = threading.Thread(target=self.watch, name='gampc-watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+        GLib.source_remove(self.source)
+        self.report()
+
+    def heartbeat(self):
+        now = time.monotonic()
+        with self.lock:
+            stall, self.stall = self.stall, None
+            duration = now - self.beat
+            self.beat = now
+        if stall is not None:
+            stall.task = self.find_task(stall.coroutine)
+            self.log_stall(stall, duration)
+        return True
+
+    def watch(self):
+        while not self.stopping.wait(self.interval):
+            with self.lock:
+                if self.stall is not None or time.monotonic() - self.beat < self.threshold:
+                    continue
+                frame = sys._current_frames().get(self.main_thread.ident)
+                if frame is None:
+                    continue
+                self.stall = Stall(traceback.extract_stack(frame), self.outermost_coroutine(frame))
+                del frame
+
+    @staticmethod
+    def outermost_coroutine(frame):
+        # The watcher only snapshots the stack: the code of the coroutine a task was stepping, if any.
+        code = None
+        while frame is not None:
+            if frame.f_code.co_flags & inspect.CO_COROUTINE:
+                code = frame.f_code
+            frame = frame.f_back
+        return code
+
+    def find_task(self, code):
+        # Tasks are looked up on the loop thread, and one that has since finished is named by its coroutine.
+        if code is None:
+            return None
+        for task in asyncio.all_tasks(self.loop):
+            if getattr(task.get_coro(), 'cr_code', None) is code:
+                return task
+        return code.co_name
+
+    def log_stall(self, stall, duration):
+        key = stall.entry, stall.site
+        stats = self.stats[key]
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] = max(stats[2], duration)
+        message = _("Main loop stalled for {duration:.0f} ms in {entry}, at {site}").format(duration=duration * 1000, entry=stall.entry, site=stall.site)
+        if stall.task is not None:
+            message += _(", task {task}").format(task=stall.task)
+        message += _(" [{count} times, {total:.0f} ms total]").format(count=stats[0], total=stats[1] * 1000)
+        if stats[0] == 1:
+            message += '\n' + ''.join(traceback.format_list(stall.stack)).rstrip()
+        logger.warning(message)
+
+    def report(self):
+        if not self.stats:
+            return
+        lines = [_("Main loop stalls:")]
+        for (entry, site), (count, total, maximum) in sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True):
+            lines.append(f"{count:6} {total * 1000:9.0f} ms {maximum * 1000:7.0f} ms max  {entry} / {site}")
+        logger.warning('\n'.join(lines))
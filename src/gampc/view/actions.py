@@ -266,8 +266,7 @@ class ViewWithCopyPasteUrl(ViewWithFiles, ViewWithCopyPaste):
         dialog_ = dialog.TextDialog(transient_for=self.get_root(), decorated=False, text='http://')
         url = await dialog_.run()
         if url:
-            item_ = item.SongItem(value=dict(file=url))
-            transfer = self.transfer_type([item_])
+            transfer = self.transfer_type([dict(file=url)])
             self.add_items(pos, transfer.value)
 
 
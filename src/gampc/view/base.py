@@ -17,6 +17,7 @@
 
 
 import re
+import weakref
 
 from gi.repository import GObject
 from gi.repository import Gio
@@ -47,14 +48,7 @@ class FieldItemColumn(Gtk.ColumnViewColumn):
         self.set_resizable(True)
 
         if sortable:
-            sorter = Gtk.CustomSorter.new(self.sort_func, field)
-            self.set_sorter(sorter)
-
-    @staticmethod
-    def sort_func(item1, item2, field):
-        s1 = item1.get_field(field.name, field.sort_default)
-        s2 = item2.get_field(field.name, field.sort_default)
-        return Gtk.Ordering.LARGER if s1 > s2 else Gtk.Ordering.SMALLER if s1 < s2 else Gtk.Ordering.EQUAL
+            self.set_sorter(field.get_sorter())
 
 
 class ListItemFactory(misc.FactoryBase):
@@ -129,6 +123,60 @@ class ItemView(Gtk.ColumnView):
                         title.remove_controller(controller)
 
 
+class ItemFilter:
+    # Filter row patterns compiled once per edit, with match results cached per item until the next edit.
+    LITERAL_SPECIALS = frozenset('.^$*+?{}[]\\|()')
+
+    def __init__(self):
+        self.patterns = {}
+        self.regexes = []
+        self.generation = 0
+        self.cache = weakref.WeakKeyDictionary()
+
+    def set_patterns(self, patterns):
+        old = self.patterns
+        if patterns == old:
+            return None
+        self.patterns = dict(patterns)
+        self.regexes = [(name, self.compile(pattern)) for name, pattern in patterns.items()]
+        self.generation += 1
+        names = old.keys() | patterns.keys()
+        if all(self.narrows(old.get(name), patterns.get(name)) for name in names):
+            return Gtk.FilterChange.MORE_STRICT
+        elif all(self.narrows(patterns.get(name), old.get(name)) for name in names):
+            return Gtk.FilterChange.LESS_STRICT
+        else:
+            return Gtk.FilterChange.DIFFERENT
+
+    @staticmethod
+    def compile(pattern):
+        try:
+            return re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            return re.compile(re.escape(pattern), re.IGNORECASE)
+
+    @classmethod
+    def narrows(cls, old, new):
+        if old is None or old == new:
+            return True
+        if new is None:
+            return False
+        return cls.LITERAL_SPECIALS.isdisjoint(old + new) and old.lower() in new.lower()
+
+    def match(self, item):
+        cached = self.cache.get(item)
+        if cached is not None and cached[0] == self.generation and cached[1] is item.value:
+            return cached[2]
+        result = True
+        for name, regex in self.regexes:
+            value = item.get_field(name)
+            if value is None or regex.search(value) is None:
+                result = False
+                break
+        self.cache[item] = (self.generation, item.value, result)
+        return result
+
+
 class ViewBase(item.WithItemModelMixin, cleanup.CleanupSignalMixin, Gtk.Box):
     filtering = GObject.Property(type=bool, default=False)
 
@@ -143,7 +191,7 @@ class ViewBase(item.WithItemModelMixin, cleanup.CleanupSignalMixin, Gtk.Box):
         self.item_view = ItemView(fields, edit_manager=edit_manager, sortable=sortable, model=self.item_selection_model, enable_rubberband=False, hexpand=True, vexpand=True, tab_behavior=Gtk.ListTabBehavior.CELL)
         self.item_view.add_css_class('items')
         self.scrolled_item_view = Gtk.ScrolledWindow(child=self.item_view)
-        self.view_search = listviewsearch.ListViewSearch(self.item_view.rows, self.search_func, list(fields.infos))
+        self.view_search = listviewsearch.ListViewSearch(self.item_view.rows, index=listviewsearch.SearchIndex(self.item_selection_model, self.search_text_func, list(fields.infos)))
         self.append(self.scrolled_item_view)
         self.add_cleanup_below(self.item_view, self.view_search)
 
@@ -151,6 +199,7 @@ class ViewBase(item.WithItemModelMixin, cleanup.CleanupSignalMixin, Gtk.Box):
             self.filter_manager = editable.EditManager()
             self.connect_clean(self.filter_manager, 'edited', self.filter_edited_cb)
             self.filter_item = item.Item(value={})
+            self.item_filter = ItemFilter()
             self.filter_store = Gio.ListStore()
             self.filter_store_selection = Gtk.NoSelection(model=self.filter_store)
             self.filter_view = ItemView(fields, edit_manager=self.filter_manager, force_editable=True, sortable=False, model=self.filter_store_selection)
@@ -174,14 +223,19 @@ class ViewBase(item.WithItemModelMixin, cleanup.CleanupSignalMixin, Gtk.Box):
             self.first_model = self.item_selection_model
 
         self.first_model.set_model(self.item_model)
+        self.set_search_store()
 
     def set_model(self, model):
         self.item_model = model
         self.first_model.set_model(model)
+        self.set_search_store()
+
+    def set_search_store(self):
+        self.view_search.index.set_store(self.item_model if isinstance(self.item_model, item.ItemListStore) else None)
 
     @staticmethod
-    def search_func(text, item, fields):
-        return any(text.lower() in str(item.get_field(name, '')).lower() for name in fields)
+    def search_text_func(item, fields):
+        return '\n'.join(str(item.get_field(name, '')) for name in fields)
 
     def grab_focus(self):
         return self.item_view.grab_focus()
@@ -190,14 +244,16 @@ class ViewBase(item.WithItemModelMixin, cleanup.CleanupSignalMixin, Gtk.Box):
         value = dict(self.filter_item.value)
         value.update(changes)
         self.filter_item.new_value(value)
-        self.filter_filter.changed(Gtk.FilterChange.DIFFERENT)
+        change = self.item_filter.set_patterns(value)
+        if change is not None:
+            self.filter_filter.changed(change)
 
     def notify_filtering_cb(self, param):
         if self.filtering:
             self.item_view.visible_titles = False
             self.prepend(self.scrolled_filter_view)
             self.filter_store.append(self.filter_item)
-            self.filter_filter.set_filter_func(self.filter_func, self.filter_item)
+            self.filter_filter.set_filter_func(self.item_filter.match)
             self.filter_view.grab_focus()
         else:
             self.remove(self.scrolled_filter_view)
@@ -206,14 +262,6 @@ class ViewBase(item.WithItemModelMixin, cleanup.CleanupSignalMixin, Gtk.Box):
             self.filter_filter.set_filter_func(None)
             self.item_view.grab_focus()
 
-    @staticmethod
-    def filter_func(item, filter_item):
-        for name, pattern in filter_item.value.items():
-            value = item.get_field(name)
-            if value is None or re.search(pattern, value, re.IGNORECASE) is None:
-                return False
-        return True
-
     def get_selected_items(self):
         return list(self.item_selection_filter_model)
 
@@ -226,6 +274,9 @@ class ViewBase(item.WithItemModelMixin, cleanup.CleanupSignalMixin, Gtk.Box):
     def get_filenames(self, selection):
         return list(map(lambda item: item.get_key(), self.item_selection_filter_model if selection else self.item_selection_model))
 
+    def get_queue_sources(self, selection, directories=True):
+        return [(filename, False) for filename in self.get_filenames(selection)]
+
     def scroll_to(self, position):
         row = self.item_view.rows.get_first_child()
         if row is None:
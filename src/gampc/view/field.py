@@ -17,6 +17,7 @@
 
 
 from gi.repository import GObject
+from gi.repository import Gtk
 
 from ..util import config
 
@@ -38,7 +39,7 @@ def config_notify_cb(obj, param, config):
 class FieldInfo(GObject.Object):
     width = GObject.Property(type=int)
 
-    def __init__(self, config, name, *, title=None, sort_default='', min_width=50, editable=False):
+    def __init__(self, config, name, *, title=None, sort_key=None, sort_default=None, min_width=50, editable=False):
         super().__init__()
         self.config = config
         self.name = name
@@ -46,6 +47,9 @@ class FieldInfo(GObject.Object):
         self.min_width = min_width
         self.connect('notify::width', self.__class__.notify_width_cb)
         self.width = self.config['width']
+        self.sort_key = sort_key
+        if sort_default is None:
+            sort_default = '' if sort_key is None else float('-inf')
         self.sort_default = sort_default
         self.editable = editable
 
@@ -55,6 +59,19 @@ class FieldInfo(GObject.Object):
         else:
             self.config['width'] = self.width
 
+    def get_sorter(self):
+        if self.sort_key is None:
+            # Plain code point order, as when strings were compared in Python.
+            return Gtk.StringSorter(expression=Gtk.ClosureExpression.new(GObject.TYPE_STRING, self.string_sort_key_func, None), ignore_case=False, collation=Gtk.Collation.NONE)
+        else:
+            return Gtk.NumericSorter(expression=Gtk.ClosureExpression.new(GObject.TYPE_DOUBLE, self.numeric_sort_key_func, None))
+
+    def string_sort_key_func(self, item):
+        return str(item.get_field(self.name, self.sort_default))
+
+    def numeric_sort_key_func(self, item):
+        return item.get_sort_key(self.name, self.sort_default, self.sort_key)
+
     # def __repr__(self):
     #     return f"Field '{self.name}'"
 